@@ -0,0 +1,35 @@
+import os
+from typing import Any, Dict, List
+
+from fastapi.responses import ORJSONResponse
+
+from services.serialization import dumps
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response that also serializes NUMERIC, interval and bytea columns (see json_default)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rows as {"columns": [...], "rows": [[...], ...]}; column names are sent once."""
+    if not rows:
+        return {"columns": [], "rows": []}
+    columns = list(rows[0])
+    return {"columns": columns, "rows": [[r.get(c) for c in columns] for r in rows]}
+
+
+def add_compression(app) -> str:
+    """Negotiate br/gzip per Accept-Encoding; brotli only when brotli-asgi is installed."""
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+        return "br+gzip"
+    except ImportError:
+        from fastapi.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+        return "gzip"
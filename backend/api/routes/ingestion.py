@@ -1,31 +1,20 @@
 from fastapi import APIRouter, UploadFile, BackgroundTasks, HTTPException, File, Query
 from typing import List
 from uuid import uuid4
-from services.document_processor import DocumentProcessor, IngestionJobs
+from services.document_processor import DocumentProcessor, IngestionJobs, UploadTooLarge, spool_upload
+from services.vector_store import VectorStore
 from services.schema_discovery import SchemaCache, SchemaDiscovery
 from logger import logger
-from redis import Redis
+from services.schema_store import SchemaStore
+from services.result_cache import CacheVersion, SQL, DOCUMENTS
 import os
 
 router = APIRouter()
-processor = DocumentProcessor(
-    model_name=os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
-    batch_size=int(os.getenv("BATCH_SIZE", "32")),
-)
+processor = DocumentProcessor(batch_size=int(os.getenv("BATCH_SIZE", "32")))
 
-def _redis():
-    return Redis(
-        host=os.getenv("REDIS_HOST", "localhost"),
-        port=int(os.getenv("REDIS_PORT", "6379")),
-        db=int(os.getenv("REDIS_DB", "0")),
-        decode_responses=True,
-    )
-
-def _bump_cache_version():
-    try:
-        _redis().incr("cache_version")
-    except Exception:
-        pass
+def _bump_cache_version(namespace: str):
+    # INCR + publish; every worker's local version (and LRU tier) follows via pub/sub
+    CacheVersion.bump(namespace)
 
 @router.post("/ingest/database")
 def ingest_database(connection_string: str | None = None):
@@ -37,9 +26,12 @@ def ingest_database(connection_string: str | None = None):
         if not conn:
             raise ValueError("connection_string required")
         schema = SchemaDiscovery().analyze_database(conn)  # type: ignore
-        SchemaCache.set(schema)
-        _bump_cache_version()
-        logger.info(f"[ingest_database] tables={len(schema.get('tables', []))} rels={len(schema.get('relationships', []))}")
+        old = SchemaCache.get()
+        # Re-ingesting an unchanged database keeps cached plans and answers
+        if not old or (SchemaCache.source() or os.getenv("DATABASE_URL")) != conn or old.get("fingerprints") != schema.get("fingerprints"):
+            SchemaStore.publish(schema, conn)
+            _bump_cache_version(SQL)
+        logger.info(f"[ingest_database] tables={len(schema.get('tables', []))} rels={len(schema.get('relationships', []))} timings_ms={schema.get('timings_ms')}")
         return {"schema": schema}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -58,7 +50,7 @@ async def ingest_documents(
     job_id = str(uuid4())
     IngestionJobs.init(job_id, total=len(files))
 
-    # Enforce type/size limits; read into memory for background processing
+    # Enforce type/size limits while streaming each upload to a spooled temp file
     allowed = {
         "application/pdf",
         "text/plain",
@@ -71,18 +63,22 @@ async def ingest_documents(
         if f.content_type not in allowed:
             IngestionJobs.error(job_id, f"{f.filename}: unsupported type {f.content_type}")
             continue
-        raw = await f.read()
-        mb = len(raw) / (1024 * 1024)
-        if mb > max_mb:
+        try:
+            fh, sha, _ = await spool_upload(f, max_mb * 1024 * 1024)
+        except UploadTooLarge:
             IngestionJobs.error(job_id, f"{f.filename}: exceeds {max_mb}MB")
             continue
         # sanitize filename (basic)
         safe_name = f.filename.replace("..", "").replace("/", "_").replace("\\", "_")[:180]
-        blobs.append({"filename": safe_name, "bytes": raw})
+        blobs.append({"filename": safe_name, "file": fh, "sha256": sha})
 
     def _work():
-        processor.process_uploads_bytes(blobs, job_id)
-        _bump_cache_version()
+        processor.process_uploads(blobs, job_id)
+        try:
+            VectorStore.snapshot()
+        except Exception as e:
+            logger.error(f"[ingest_documents] snapshot failed job_id={job_id}: {e}")
+        _bump_cache_version(DOCUMENTS)
         logger.info(f"[ingest_documents] completed job_id={job_id} total={IngestionJobs.get(job_id).get('total')}")
 
     background_tasks.add_task(_work)
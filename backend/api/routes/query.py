@@ -1,10 +1,16 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import os
+from typing import List, Literal
+from api.responses import FastJSONResponse, columnar
 from time import perf_counter
 from services.query_engine import QueryEngine, QueryHistory
 
 router = APIRouter()
 _engine = None
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "50"))
 
 def engine():
     global _engine
@@ -16,20 +22,77 @@ class QueryIn(BaseModel):
     query: str
     limit: int = 50
     offset: int = 0
+    cursor: str | None = None  # next_cursor from the previous page (list queries)
+    format: Literal["rows", "columnar"] = "rows"  # columnar: column names once, rows as arrays
 
 @router.post("/query")
-def query(inp: QueryIn):
+async def query(inp: QueryIn):
     t0 = perf_counter()
     try:
-        out = engine().process_query(inp.query, limit=inp.limit, offset=inp.offset)
+        # First call builds the engine (schema discovery); keep that off the event loop
+        eng = _engine or await run_in_threadpool(engine)
+        if eng.async_mode:
+            out = await eng.process_query_async(inp.query, limit=inp.limit, offset=inp.offset, cursor=inp.cursor)
+        else:
+            out = await run_in_threadpool(eng.process_query, inp.query, limit=inp.limit, offset=inp.offset, cursor=inp.cursor)
         out.setdefault("performance_metrics", {})
         out["performance_metrics"]["response_time_ms"] = int((perf_counter() - t0) * 1000)
         out["performance_metrics"].setdefault("cache_hit", False)
         QueryHistory.append(inp.query, out["performance_metrics"])
-        return out
+        if inp.format == "columnar" and isinstance(out.get("results", {}).get("table"), list):
+            out["results"]["table"] = columnar(out["results"]["table"])
+        # Returning the response directly skips jsonable_encoder; orjson encodes in one pass
+        return FastJSONResponse(out)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+class BatchIn(BaseModel):
+    queries: List[QueryIn]
+
+@router.post("/query/batch")
+async def query_batch(inp: BatchIn):
+    """
+    Run many queries in one request: duplicates run once, cache hits come from
+    one MGET, document searches share one embedding batch, SQL misses run
+    concurrently. Failed queries carry an "error" instead of failing the batch.
+    """
+    if len(inp.queries) > QUERY_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"at most {QUERY_BATCH_MAX} queries per batch")
+    try:
+        eng = _engine or await run_in_threadpool(engine)
+        items = [{"query": q.query, "limit": q.limit, "offset": q.offset, "cursor": q.cursor} for q in inp.queries]
+        if eng.async_mode:
+            outs, batch_metrics = await eng.process_batch_async(items)
+        else:
+            outs, batch_metrics = await run_in_threadpool(eng.process_batch, items)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    responses = []
+    for q, out in zip(inp.queries, outs):
+        QueryHistory.append(q.query, out.get("performance_metrics", {}))
+        if q.format == "columnar" and isinstance(out.get("results", {}).get("table"), list):
+            # Duplicates share one result object; reshape a copy
+            out = {**out, "results": {**out["results"], "table": columnar(out["results"]["table"])}}
+        responses.append(out)
+    return FastJSONResponse({"results": responses, "batch_metrics": batch_metrics})
+
+class StreamIn(BaseModel):
+    query: str
+    max_rows: int | None = None  # no cap by default: this is the export path
+
+@router.post("/query/stream")
+async def query_stream(inp: StreamIn):
+    """
+    Stream SQL results as NDJSON: header line, one line per row, trailer with
+    row count and time_to_first_row_ms.
+    """
+    try:
+        eng = _engine or await run_in_threadpool(engine)
+        body = await run_in_threadpool(eng.stream_query, inp.query, inp.max_rows)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
 @router.get("/query/history")
-def history():
-    return {"history": QueryHistory.tail(50)}
+def history(n: int = 50):
+    return {"history": QueryHistory.tail(max(1, n))}
@@ -6,9 +6,17 @@ from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 
 from api.routes import schema_routes, ingestion, query
+from api.responses import FastJSONResponse, add_compression
 from logger import logger
+from models import redis_pool
+from services.embeddings import Embeddings
+from services.plan_cache import PlanCache
+from services.result_cache import CacheVersion, ResultCache
+from services.schema_refresher import SchemaRefresher
+from services.schema_store import SchemaStore
+from services.vector_store import VectorStore
 
-app = FastAPI(title="NLP Employee Query Engine", version="0.1.0")
+app = FastAPI(title="NLP Employee Query Engine", version="0.1.0", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,11 +25,38 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+add_compression(app)
+
+@app.on_event("startup")
+def startup():
+    redis_pool.init()
+    CacheVersion.start()
+    # Shared schema: load what another worker (or the last run) discovered, follow new versions
+    SchemaStore.load()
+    SchemaStore.start()
+    SchemaRefresher.start()
+    # Warm restart: memory-map the last snapshot instead of re-embedding the corpus
+    VectorStore.load()
+    if os.getenv("EMBEDDINGS_WARMUP", "0") == "1":
+        Embeddings.warmup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    SchemaRefresher.stop()
+    await redis_pool.close()
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "redis_pool": redis_pool.stats(),
+        "result_cache": ResultCache.stats(),
+        "plan_cache": PlanCache.stats(),
+    }
+
 app.include_router(schema_routes.router, prefix="/api")
 app.include_router(ingestion.router, prefix="/api")
 app.include_router(query.router, prefix="/api")
@@ -1,11 +1,13 @@
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 POOL_SIZE = int(os.getenv("POOL_SIZE", "10"))
 
 _engine = None
+_async_engine: AsyncEngine | None = None
 
 def engine():
     global _engine
@@ -19,3 +21,21 @@ def engine():
             future=True,
         )
     return _engine
+
+def async_url(url: str) -> str:
+    """Map a sync Postgres URL (postgresql://, postgresql+psycopg2://) to the asyncpg driver."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.split("+")[0] in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+def async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL),
+            pool_size=POOL_SIZE,
+            max_overflow=5,
+            pool_pre_ping=True,
+        )
+    return _async_engine
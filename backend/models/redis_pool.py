@@ -0,0 +1,85 @@
+import os
+from redis import Redis, BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis, BlockingConnectionPool as AsyncBlockingConnectionPool
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+# Seconds a caller waits for a free connection once all are checked out
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "1.0"))
+
+# One application-scoped pool per I/O model. Clients return raw bytes;
+# callers decode (orjson.loads takes bytes directly). Blocking pools: at
+# REDIS_MAX_CONNECTIONS callers queue for a connection instead of failing,
+# which every cache caller would otherwise swallow as a miss.
+_pool: BlockingConnectionPool | None = None
+_async_pool: AsyncBlockingConnectionPool | None = None
+
+def _kwargs():
+    return dict(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+    )
+
+def init():
+    pool()
+    async_pool()
+
+def pool() -> BlockingConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = BlockingConnectionPool(**_kwargs())
+    return _pool
+
+def async_pool() -> AsyncBlockingConnectionPool:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncBlockingConnectionPool(**_kwargs())
+    return _async_pool
+
+def client() -> Redis:
+    return Redis(connection_pool=pool())
+
+def async_client() -> AsyncRedis:
+    return AsyncRedis(connection_pool=async_pool())
+
+async def close():
+    global _pool, _async_pool
+    if _async_pool is not None:
+        await _async_pool.disconnect()
+        _async_pool = None
+    if _pool is not None:
+        _pool.disconnect()
+        _pool = None
+
+def _pool_stats(p) -> dict:
+    if p is None:
+        return {"created": 0, "in_use": 0, "idle": 0, "max": REDIS_MAX_CONNECTIONS, "utilization": 0.0}
+    if hasattr(p, "_in_use_connections"):
+        created = getattr(p, "_created_connections", 0)
+        in_use = len(p._in_use_connections)
+        idle = len(p._available_connections)
+    else:
+        # Queue-based blocking pool: the queue holds idle connections and None slots
+        created = len(p._connections)
+        idle = sum(1 for c in list(p.pool.queue) if c is not None)
+        in_use = created - idle
+    return {
+        "created": created,
+        "in_use": in_use,
+        "idle": idle,
+        "max": p.max_connections,
+        "utilization": round(in_use / p.max_connections, 3) if p.max_connections else 0.0,
+    }
+
+def stats() -> dict:
+    return {"sync": _pool_stats(_pool), "async": _pool_stats(_async_pool)}
@@ -0,0 +1,154 @@
+import re
+import string
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+SECTION_HEADERS = ["skills", "experience", "projects", "education", "summary", "review", "scope", "clause"]
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+# ASCII bytes matched by \w or \s (str patterns also treat \x1c-\x1f as space)
+_WORD_SPACE = (string.ascii_letters + string.digits + "_" + string.whitespace + "\x1c\x1d\x1e\x1f").encode("ascii")
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+def _line_ends(lines: List[str]) -> List[int]:
+    """Offset just past each line in "\\n".join(lines), for mapping match positions to lines."""
+    return list(accumulate(len(ln) + 1 for ln in lines))
+
+
+def approx_token_counts(lines: List[str]) -> List[int]:
+    """Word/punctuation count; a close lower bound for WordPiece token counts."""
+    counts = [len(ln.split()) for ln in lines]
+    text = "\n".join(lines)
+    try:
+        raw = text.encode("ascii")
+    except UnicodeEncodeError:
+        ends = _line_ends(lines)
+        for m in _PUNCT_RE.finditer(text):
+            counts[bisect_right(ends, m.start())] += 1
+        return counts
+    # ASCII fast path: deleting word and space bytes leaves exactly what
+    # [^\w\s] matches, at C speed, so most blocks cost one translate
+    if not raw.translate(None, _WORD_SPACE):
+        return counts
+    return [n + len(ln.encode("ascii").translate(None, _WORD_SPACE)) for n, ln in zip(counts, lines)]
+
+
+def header_lines(lines: List[str]) -> List[int]:
+    """Indexes of the lines mentioning a section header (case-insensitive)."""
+    text = "\n".join(lines)
+    low = text.lower()
+    if len(low) != len(text):
+        # Some characters change length when lowercased; offsets would drift
+        return [i for i, ln in enumerate(lines) if any(h in ln.lower() for h in SECTION_HEADERS)]
+    found = set()
+    ends: List[int] | None = None
+    # str.find per header is far faster than scanning with a regex alternation
+    for h in SECTION_HEADERS:
+        pos = low.find(h)
+        while pos != -1:
+            ends = ends or _line_ends(lines)
+            i = bisect_right(ends, pos)
+            found.add(i)
+            pos = low.find(h, ends[i]) if i < len(ends) else -1
+    return sorted(found)
+
+
+class Chunker:
+    """
+    Streaming, token-aware chunker.
+
+    Splits on section headers (a new chunk starts at any line mentioning one)
+    and whenever the running token total would exceed ``max_tokens``. Size
+    splits carry the trailing ``overlap_tokens`` worth of lines into the next
+    chunk. Lines are tokenized and scanned for headers in blocks, and every
+    line is counted once, so the whole pass is linear in the input.
+    """
+
+    def __init__(self, max_tokens: int = 250, overlap_tokens: int = 32,
+                 count_tokens: TokenCounter | None = None, block_lines: int = 512):
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.count_tokens = count_tokens or approx_token_counts
+        self.block_lines = block_lines
+
+    def chunk(self, content: str) -> List[str]:
+        return list(self.iter_chunks(content.splitlines()))
+
+    def iter_chunks(self, lines: Iterable[str]) -> Iterator[str]:
+        max_tokens = self.max_tokens
+        buf: List[str] = []
+        counts: List[int] = []
+        total = 0
+        for block, block_counts, heads in self._blocks(lines):
+            start = 0
+            for stop in heads + [len(block)]:
+                # Lines in [start, stop) carry no header; the one at ``stop`` does
+                for ln, n in zip(block[start:stop], block_counts[start:stop]):
+                    if total + n > max_tokens:
+                        if n > max_tokens:
+                            total = yield from self._add_oversized(ln, n, buf, counts, total)
+                            continue
+                        yield from self._emit(buf)
+                        total = self._keep_overlap(buf, counts)
+                        if total + n > max_tokens:
+                            buf.clear()
+                            counts.clear()
+                            total = 0
+                    buf.append(ln)
+                    counts.append(n)
+                    total += n
+                if stop < len(block) and buf:
+                    yield from self._emit(buf)
+                    buf.clear()
+                    counts.clear()
+                    total = 0
+                start = stop
+        if buf:
+            yield from self._emit(buf)
+
+    def _blocks(self, lines: Iterable[str]) -> Iterator[Tuple[List[str], List[int], List[int]]]:
+        block: List[str] = []
+        for ln in lines:
+            block.append(ln.strip())
+            if len(block) >= self.block_lines:
+                yield block, self.count_tokens(block), header_lines(block)
+                block = []
+        if block:
+            yield block, self.count_tokens(block), header_lines(block)
+
+    def _add_oversized(self, ln: str, n: int, buf: List[str], counts: List[int], total: int):
+        """Split a single line that is larger than the budget into word windows; returns the new total."""
+        words = ln.split()
+        step = max(1, len(words) * self.max_tokens // max(n, 1))
+        pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        for piece, pn in zip(pieces, self.count_tokens(pieces)):
+            if buf and total + pn > self.max_tokens:
+                yield from self._emit(buf)
+                total = self._keep_overlap(buf, counts)
+                if total + pn > self.max_tokens:
+                    buf.clear()
+                    counts.clear()
+                    total = 0
+            buf.append(piece)
+            counts.append(pn)
+            total += pn
+        return total
+
+    def _keep_overlap(self, buf: List[str], counts: List[int]) -> int:
+        kept = 0
+        i = len(counts)
+        while i and kept + counts[i - 1] <= self.overlap_tokens:
+            i -= 1
+            kept += counts[i]
+        del buf[:i]
+        del counts[:i]
+        return kept
+
+    @staticmethod
+    def _emit(buf: List[str]) -> Iterator[str]:
+        text = "\n".join(buf).strip()
+        if text:
+            yield text
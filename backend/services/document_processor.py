@@ -1,102 +1,316 @@
-import io, csv
-from typing import List, Dict, Any
+import os
+import hashlib
+import queue
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, List, Dict, Any, Tuple
 from fastapi import UploadFile
-from sentence_transformers import SentenceTransformer
-import faiss, numpy as np
-
-try:
-    from unstructured.partition.pdf import partition_pdf
-except Exception:
-    partition_pdf = None
-try:
-    from unstructured.partition.docx import partition_docx
-except Exception:
-    partition_docx = None
+
+from services.chunker import Chunker, approx_token_counts
+from services.embeddings import Embeddings
+from services.extraction import extract_text, needs_process
+from services.vector_store import VectorStore
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "250"))  # all-MiniLM-L6-v2 truncates at 256
+# Structured exports (csv, ...) get a larger budget than prose, as the character chunker did (1600 vs 1400)
+CHUNK_MAX_TOKENS_OTHER = int(os.getenv("CHUNK_MAX_TOKENS_OTHER", "256"))
+PROSE_TYPES = ("pdf", "docx", "txt")
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "model").lower()  # model | approx
+SPOOL_MAX_BYTES = int(os.getenv("INGEST_SPOOL_MB", "1")) * 1024 * 1024  # uploads above this spill to disk
+READ_BLOCK = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def spool_upload(f: UploadFile, max_bytes: int) -> Tuple[IO[bytes], str, int]:
+    """
+    Stream an upload into a spooled temp file in fixed-size blocks, hashing as it goes.
+    Raises UploadTooLarge as soon as ``max_bytes`` is exceeded. Returns (handle, sha256, size).
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            block = await f.read(READ_BLOCK)
+            if not block:
+                break
+            size += len(block)
+            if size > max_bytes:
+                raise UploadTooLarge(f"exceeds {max_bytes // (1024 * 1024)}MB")
+            sha.update(block)
+            spool.write(block)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, sha.hexdigest(), size
+
+_STOP = object()
 
 class IngestionJobs:
     _jobs: Dict[str, Dict[str, Any]] = {}
+    _lock = threading.Lock()
     @classmethod
     def init(cls, job_id: str, total: int):
-        cls._jobs[job_id] = {"total": total, "done": 0, "errors": [], "files": []}
+        cls._jobs[job_id] = {
+            "total": total, "done": 0, "errors": [], "files": [],
+            "chunks_total": 0, "chunks_embedded": 0, "chunks_reused": 0, "chunks_retired": 0,
+        }
+    @classmethod
+    def inc(cls, job_id: str, fname: str, status: str = "processed"):
+        with cls._lock:
+            cls._jobs[job_id]["done"] += 1
+            cls._jobs[job_id]["files"].append({"file": fname, "status": status})
     @classmethod
-    def inc(cls, job_id: str, fname: str):
-        cls._jobs[job_id]["done"] += 1
-        cls._jobs[job_id]["files"].append({"file": fname, "status": "processed"})
+    def count(cls, job_id: str, field: str, n: int):
+        with cls._lock:
+            cls._jobs[job_id][field] += n
     @classmethod
     def error(cls, job_id: str, msg: str):
-        cls._jobs[job_id]["errors"].append(msg)
+        with cls._lock:
+            cls._jobs[job_id]["errors"].append(msg)
     @classmethod
     def get(cls, job_id: str):
         return cls._jobs.get(job_id)
 
-class VectorStore:
-    index = faiss.IndexFlatIP(384)  # all-MiniLM-L6-v2
-    meta: List[Dict[str, Any]] = []
-
 class DocumentProcessor:
-    def __init__(self, model_name: str, batch_size: int = 32):
-        self.model = SentenceTransformer(model_name)
+    """
+    Staged ingestion pipeline:
+      extract (process pool for PDF/DOCX) -> chunk -> embed in batches -> append to VectorStore
+    Stages run concurrently and are connected by bounded queues, so chunks
+    become searchable as each batch lands and memory stays bounded.
+
+    Files and chunks are identified by sha256: an unchanged file is skipped
+    before extraction, and a changed one only embeds chunks whose hash is new;
+    its stale chunks are retired once the new ones are indexed.
+    """
+    _pool: ProcessPoolExecutor | None = None
+    _chunkers: Dict[int, Chunker] = {}  # budget -> chunker
+    _pool_lock = threading.Lock()
+
+    def __init__(self, batch_size: int = 32):
         self.batch = batch_size
 
-    async def process_uploads_async(self, files: List[UploadFile], job_id: str):
+    @classmethod
+    def pool(cls) -> ProcessPoolExecutor:
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    # spawn: forking a process that already runs threads can deadlock the child
+                    cls._pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return cls._pool
+
+    @classmethod
+    def _reset_pool(cls, broken: ProcessPoolExecutor) -> None:
+        """Drop a pool whose worker died (OOM, segfault); the next pool() starts a fresh one."""
+        with cls._pool_lock:
+            if cls._pool is broken:
+                cls._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _reset_broken_pool(cls) -> None:
+        pool = cls._pool
+        if pool is None:
+            return
+        try:
+            # A broken executor refuses new work, so a no-op submit tells it apart from a fresh one
+            pool.submit(int).cancel()
+        except BrokenProcessPool:
+            cls._reset_pool(pool)
+
+    async def process_uploads_async(self, files: List[UploadFile], job_id: str, max_bytes: int):
         blobs = []
         for f in files:
-            raw = await f.read()
-            blobs.append({"filename": f.filename, "bytes": raw})
-        self.process_uploads_bytes(blobs, job_id)
+            try:
+                fh, sha, _ = await spool_upload(f, max_bytes)
+            except UploadTooLarge as e:
+                IngestionJobs.error(job_id, f"{f.filename}: {e}")
+                continue
+            blobs.append({"filename": f.filename, "file": fh, "sha256": sha})
+        self.process_uploads(blobs, job_id)
+
+    def process_uploads(self, blobs: List[Dict[str, Any]], job_id: str):
+        """
+        Ingest uploads. Each blob has "filename" and either "file" (a binary
+        handle, closed here once consumed) or "bytes"; "sha256" is optional.
+        """
+        chunk_q: queue.Queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        vec_q: queue.Queue = queue.Queue(maxsize=max(2, INGEST_QUEUE_SIZE // self.batch))
+        remaining: Dict[int, int] = {}
+        versions: Dict[int, tuple] = {}  # file_no -> (filename, file_sha, chunk shas to keep)
+        failed: set = set()
+
+        embedder = threading.Thread(target=self._embed_stage, args=(chunk_q, vec_q, failed, job_id), daemon=True)
+        appender = threading.Thread(target=self._append_stage, args=(vec_q, remaining, versions, failed, job_id), daemon=True)
+        embedder.start()
+        appender.start()
+        try:
+            self._extract_stage(blobs, chunk_q, remaining, versions, job_id)
+        finally:
+            chunk_q.put(_STOP)
+            embedder.join()
+            appender.join()
+            for blob in blobs:
+                if blob.get("file") is not None:
+                    blob["file"].close()
+        VectorStore.maybe_rebuild()
 
-    def process_uploads_bytes(self, blobs: List[Dict[str, Any]], job_id: str):
-        texts, metas = [], []
-        for blob in blobs:
+    # Stage 1 + 2: extract (in worker processes for heavy formats) and chunk
+    def _extract_stage(self, blobs: List[Dict[str, Any]], chunk_q: queue.Queue, remaining: Dict[int, int], versions: Dict[int, tuple], job_id: str):
+        pending: deque = deque()
+        for file_no, blob in enumerate(blobs):
+            fname = blob["filename"]
+            file_sha = blob.get("sha256") or self._hash(blob)
+            if VectorStore.file_sha(fname) == file_sha:
+                IngestionJobs.count(job_id, "chunks_reused", VectorStore.live_chunks(fname))
+                IngestionJobs.inc(job_id, fname, status="unchanged")
+                continue
+            pending.append((file_no, fname, file_sha, self._submit(fname, self._read(blob))))
+            # Bound in-flight extractions so raw bytes and text don't pile up;
+            # peak memory is ~2 * INGEST_WORKERS files regardless of batch size
+            while len(pending) >= INGEST_WORKERS * 2:
+                self._chunk_file(*pending.popleft(), chunk_q, remaining, versions, job_id)
+        while pending:
+            self._chunk_file(*pending.popleft(), chunk_q, remaining, versions, job_id)
+
+    @staticmethod
+    def _hash(blob: Dict[str, Any]) -> str:
+        if blob.get("file") is None:
+            return hashlib.sha256(blob["bytes"]).hexdigest()
+        fh = blob["file"]
+        fh.seek(0)
+        sha = hashlib.sha256()
+        for block in iter(lambda: fh.read(READ_BLOCK), b""):
+            sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _read(blob: Dict[str, Any]) -> bytes:
+        """Materialize one upload; the handle is released right away."""
+        if blob.get("file") is None:
+            return blob.pop("bytes")
+        fh = blob.pop("file")
+        try:
+            fh.seek(0)
+            return fh.read()
+        finally:
+            fh.close()
+
+    def _submit(self, fname: str, raw: bytes) -> Future:
+        fut: Future = Future()
+        if needs_process(fname):
+            pool = self.pool()
             try:
-                detected, chunks = self._extract_and_chunk(blob["filename"], blob["bytes"])
-                for ch in chunks:
-                    texts.append(ch)
-                    metas.append({
-                        "filename": blob["filename"],
-                        "type": detected,
-                        "snippet": ch[:300]
-                    })
-                IngestionJobs.inc(job_id, blob["filename"])
+                return pool.submit(extract_text, fname, raw)
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                fut.set_exception(e)
+                return fut
+        try:
+            fut.set_result(extract_text(fname, raw))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def _chunk_file(self, file_no: int, fname: str, file_sha: str, fut: Future, chunk_q: queue.Queue,
+                    remaining: Dict[int, int], versions: Dict[int, tuple], job_id: str):
+        try:
+            detected, txt = fut.result()
+            chunks = self.dynamic_chunking(txt, detected)
+        except BrokenProcessPool:
+            # Every extraction queued on the dead pool fails the same way; the
+            # first one to notice replaces it for the files still to come
+            self._reset_broken_pool()
+            IngestionJobs.error(job_id, f"{fname}: extraction worker died (out of memory or crashed)")
+            return
+        except Exception as e:
+            IngestionJobs.error(job_id, f"{fname}: {e}")
+            return
+
+        existing = VectorStore.chunk_shas(fname)
+        keep: set = set()
+        fresh = []
+        for ch in chunks:
+            sha = hashlib.sha256(ch.encode()).hexdigest()
+            if sha in keep:
+                continue
+            keep.add(sha)
+            if sha not in existing:
+                fresh.append((ch, sha))
+        IngestionJobs.count(job_id, "chunks_reused", len(keep & existing))
+        versions[file_no] = (fname, file_sha, keep)
+        if not fresh:
+            self._finish_file(file_no, versions, job_id)
+            return
+        remaining[file_no] = len(fresh)
+        IngestionJobs.count(job_id, "chunks_total", len(fresh))
+        for ch, sha in fresh:
+            meta = {"filename": fname, "type": detected, "snippet": ch[:300], "file_sha": file_sha, "chunk_sha": sha}
+            chunk_q.put((file_no, ch, meta))
+
+    def _finish_file(self, file_no: int, versions: Dict[int, tuple], job_id: str):
+        fname, file_sha, keep = versions[file_no]
+        retired = VectorStore.reconcile_file(fname, file_sha, keep)
+        IngestionJobs.count(job_id, "chunks_retired", retired)
+        IngestionJobs.inc(job_id, fname)
+
+    # Stage 3: embed in batches; flush early when the queue runs dry so results land promptly
+    def _embed_stage(self, chunk_q: queue.Queue, vec_q: queue.Queue, failed: set, job_id: str):
+        buf: List[tuple] = []
+        while True:
+            item = chunk_q.get()
+            if item is not _STOP:
+                buf.append(item)
+            if buf and (item is _STOP or len(buf) >= self.batch * 4 or chunk_q.empty()):
+                try:
+                    vecs = Embeddings.encode([ch for _, ch, _ in buf], batch_size=self.batch)
+                    vec_q.put((vecs, buf))
+                except Exception as e:
+                    failed.update(file_no for file_no, _, _ in buf)
+                    IngestionJobs.error(job_id, f"embedding failed for {len(buf)} chunks: {e}")
+                buf = []
+            if item is _STOP:
+                vec_q.put(_STOP)
+                return
+
+    # Stage 4: incremental index appends
+    def _append_stage(self, vec_q: queue.Queue, remaining: Dict[int, int], versions: Dict[int, tuple], failed: set, job_id: str):
+        while True:
+            item = vec_q.get()
+            if item is _STOP:
+                return
+            vecs, batch = item
+            try:
+                VectorStore.add(vecs, [meta for _, _, meta in batch])
             except Exception as e:
-                IngestionJobs.error(job_id, f'{blob.get("filename")}: {e}')
-        if texts:
-            vecs = self.model.encode(texts, batch_size=self.batch, convert_to_numpy=True, normalize_embeddings=True)
-            VectorStore.index.add(vecs.astype(np.float32))
-            VectorStore.meta.extend(metas)
-
-    def _extract_and_chunk(self, filename: str, raw: bytes):
-        name = filename.lower()
-        if name.endswith(".pdf") and partition_pdf:
-            elements = partition_pdf(file=io.BytesIO(raw))
-            txt = "\n".join([getattr(el, "text", "") for el in elements if getattr(el, "text", "")])
-            return "pdf", self.dynamic_chunking(txt, "pdf")
-        if name.endswith(".docx") and partition_docx:
-            elements = partition_docx(file=io.BytesIO(raw))
-            txt = "\n".join([getattr(el, "text", "") for el in elements if getattr(el, "text", "")])
-            return "docx", self.dynamic_chunking(txt, "docx")
-        if name.endswith(".csv"):
-            txt = raw.decode(errors="ignore")
-            txt = "\n".join([", ".join(r) for r in csv.reader(io.StringIO(txt))])
-            return "csv", self.dynamic_chunking(txt, "csv")
-        txt = raw.decode(errors="ignore")
-        return "txt", self.dynamic_chunking(txt, "txt")
+                failed.update(file_no for file_no, _, _ in batch)
+                IngestionJobs.error(job_id, f"index append failed for {len(batch)} chunks: {e}")
+                continue
+            IngestionJobs.count(job_id, "chunks_embedded", len(batch))
+            for file_no, _, _ in batch:
+                remaining[file_no] -= 1
+                if remaining[file_no] == 0 and file_no not in failed:
+                    self._finish_file(file_no, versions, job_id)
 
     def dynamic_chunking(self, content: str, doc_type: str) -> list[str]:
-        headers = ["skills", "experience", "projects", "education", "summary", "review", "scope", "clause"]
-        lines = [ln.strip() for ln in content.splitlines()]
-        max_len = 1400 if doc_type in ("pdf", "docx", "txt") else 1600
-        parts, buf = [], []
-        for ln in lines:
-            if any(h in ln.lower() for h in headers) and buf:
-                parts.append("\n".join(buf).strip())
-                buf = [ln]
-            else:
-                if len("\n".join(buf)) + len(ln) + 1 > max_len:
-                    parts.append("\n".join(buf).strip())
-                    buf = [ln]
-                else:
-                    buf.append(ln)
-        if buf:
-            parts.append("\n".join(buf).strip())
-        return [p for p in parts if p]
+        return self.chunker(doc_type).chunk(content)
+
+    @classmethod
+    def chunker(cls, doc_type: str = "txt") -> Chunker:
+        budget = CHUNK_MAX_TOKENS if doc_type in PROSE_TYPES else CHUNK_MAX_TOKENS_OTHER
+        chunker = cls._chunkers.get(budget)
+        if chunker is None:
+            counter = Embeddings.count_tokens if CHUNK_TOKENIZER == "model" else approx_token_counts
+            chunker = cls._chunkers[budget] = Chunker(max_tokens=budget, overlap_tokens=CHUNK_OVERLAP_TOKENS, count_tokens=counter)
+        return chunker
@@ -0,0 +1,193 @@
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from redis import Redis
+from sentence_transformers import SentenceTransformer
+
+from logger import logger
+from models import redis_pool
+
+# Sentences used to check an optimized backend against the reference torch model
+_PROBES = [
+    "Average salary by department",
+    "Who reports to Anjali Gupta?",
+    "Show me performance reviews for engineers hired last year",
+    "Python developer with experience in data platforms and Spark",
+    "Benefits policy: health insurance, parental leave and remote work allowance",
+]
+
+
+class Embeddings:
+    """
+    Process-wide sentence embedding model shared by ingestion and query paths.
+
+    Loaded lazily on first encode (or by warmup()). EMBEDDINGS_BACKEND selects
+    the execution backend: "torch" (default) or "onnx"; with onnx,
+    EMBEDDINGS_ONNX_FILE may point at a quantized export such as
+    "onnx/model_qint8_avx512_vnni.onnx". An optimized backend is checked
+    against torch when it loads, before it serves anything.
+    """
+    model_name = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    backend = os.getenv("EMBEDDINGS_BACKEND", "torch").lower()
+    onnx_file = os.getenv("EMBEDDINGS_ONNX_FILE", "")
+    min_cosine = float(os.getenv("EMBEDDINGS_MIN_COSINE", "0.99"))
+
+    _model: SentenceTransformer | None = None
+    _tokenizer = None
+    _lock = threading.Lock()
+    _tok_lock = threading.Lock()
+
+    @classmethod
+    def model(cls) -> SentenceTransformer:
+        if cls._model is None:
+            with cls._lock:
+                if cls._model is None:
+                    model = cls._load(cls.backend)
+                    cls._model = model if cls.backend == "torch" else cls._verified(model)
+        return cls._model
+
+    @classmethod
+    def encode(cls, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Normalized float32 embeddings, one row per text."""
+        vecs = cls.model().encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        return vecs.astype(np.float32, copy=False)
+
+    @classmethod
+    def count_tokens(cls, lines: List[str]) -> List[int]:
+        """WordPiece token counts (without special tokens) for each line."""
+        with cls._tok_lock:
+            if cls._tokenizer is None:
+                # A standalone tokenizer: sharing the model's one across threads
+                # can trip the fast tokenizer's "Already borrowed" guard mid-encode
+                from transformers import AutoTokenizer
+                cls._tokenizer = AutoTokenizer.from_pretrained(cls.model_name)
+            ids = cls._tokenizer(lines, add_special_tokens=False, return_attention_mask=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    @classmethod
+    def warmup(cls) -> None:
+        """Load (and for optimized backends, verify) the model eagerly."""
+        t0 = time.perf_counter()
+        cls.model()
+        cls.encode(["warmup"])
+        logger.info(f"[embeddings] ready model={cls.model_name} backend={cls.backend} ms={int((time.perf_counter() - t0) * 1000)}")
+
+    @classmethod
+    def _verified(cls, candidate: SentenceTransformer) -> SentenceTransformer:
+        """
+        Compare an optimized backend with the torch baseline on probe sentences.
+        Returns the baseline instead if the worst cosine similarity is below
+        EMBEDDINGS_MIN_COSINE. Called by model() under _lock.
+        """
+        baseline = cls._load("torch")
+        ref = baseline.encode(_PROBES, convert_to_numpy=True, normalize_embeddings=True)
+        got = candidate.encode(_PROBES, convert_to_numpy=True, normalize_embeddings=True)
+        worst = float(np.min(np.sum(ref * got, axis=1)))
+        if worst < cls.min_cosine:
+            logger.warning(f"[embeddings] backend={cls.backend} min_cosine={worst:.4f} < {cls.min_cosine}; falling back to torch")
+            cls.backend = "torch"
+            return baseline
+        logger.info(f"[embeddings] backend={cls.backend} verified min_cosine={worst:.4f}")
+        return candidate
+
+    @classmethod
+    def _load(cls, backend: str) -> SentenceTransformer:
+        if backend == "onnx":
+            kwargs = {"file_name": cls.onnx_file} if cls.onnx_file else {}
+            try:
+                return SentenceTransformer(cls.model_name, backend="onnx", model_kwargs=kwargs)
+            except Exception as e:
+                # Older sentence-transformers or missing optimum/onnxruntime
+                logger.warning(f"[embeddings] onnx backend unavailable ({e}); using torch")
+                cls.backend = "torch"
+        return SentenceTransformer(cls.model_name)
+
+
+class EmbeddingCache:
+    """
+    Query-embedding cache: bounded in-process LRU in front of a shared Redis
+    tier holding raw float32 bytes. Keys are (model name, normalized text).
+    """
+    max_items = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+    ttl = int(os.getenv("EMBED_CACHE_TTL", "86400"))
+
+    _lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    _lock = threading.Lock()
+    counters: Dict[str, int] = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # all-MiniLM-L6-v2 is uncased and whitespace-insensitive, so this folding is lossless
+        return " ".join(text.lower().split())
+
+    @classmethod
+    def key(cls, text: str) -> str:
+        digest = hashlib.sha256(f"{Embeddings.model_name}|{cls.normalize(text)}".encode()).hexdigest()
+        return f"emb:{digest}"
+
+    @classmethod
+    def redis(cls) -> Redis:
+        return redis_pool.client()
+
+    @classmethod
+    def encode_queries(cls, queries: List[str]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Embed queries through the cache. Returns the (n, dim) matrix and, per
+        query, the tier that served it: "memory", "redis" or "miss".
+        """
+        keys = [cls.key(q) for q in queries]
+        vecs: List[np.ndarray | None] = [None] * len(queries)
+        tiers = ["miss"] * len(queries)
+
+        with cls._lock:
+            for i, k in enumerate(keys):
+                v = cls._lru.get(k)
+                if v is not None:
+                    cls._lru.move_to_end(k)
+                    vecs[i], tiers[i] = v, "memory"
+
+        pending = [i for i, v in enumerate(vecs) if v is None]
+        if pending:
+            try:
+                raw = cls.redis().mget([keys[i] for i in pending])
+            except Exception:
+                raw = [None] * len(pending)
+            for i, blob in zip(pending, raw):
+                if blob:
+                    vecs[i], tiers[i] = np.frombuffer(blob, dtype=np.float32), "redis"
+
+        misses = [i for i, v in enumerate(vecs) if v is None]
+        if misses:
+            # Encode each distinct miss once even if it repeats within the batch
+            uniq: Dict[str, int] = {}
+            for i in misses:
+                uniq.setdefault(keys[i], i)
+            fresh = Embeddings.encode([queries[i] for i in uniq.values()])
+            by_key = {k: fresh[j] for j, k in enumerate(uniq)}
+            for i in misses:
+                vecs[i] = by_key[keys[i]]
+            try:
+                pipe = cls.redis().pipeline(transaction=False)
+                for k, v in by_key.items():
+                    pipe.setex(k, cls.ttl, v.tobytes())
+                pipe.execute()
+            except Exception:
+                pass
+
+        with cls._lock:
+            for i, k in enumerate(keys):
+                if tiers[i] != "memory":
+                    cls._lru[k] = vecs[i]
+                    cls._lru.move_to_end(k)
+            while len(cls._lru) > cls.max_items:
+                cls._lru.popitem(last=False)
+            cls.counters["memory_hits"] += tiers.count("memory")
+            cls.counters["redis_hits"] += tiers.count("redis")
+            cls.counters["misses"] += tiers.count("miss")
+
+        return np.vstack(vecs).astype(np.float32, copy=False), tiers
@@ -0,0 +1,33 @@
+import io, csv
+from typing import Tuple
+
+# Kept free of heavy imports: this module is loaded by the ingestion process pool workers
+try:
+    from unstructured.partition.pdf import partition_pdf
+except Exception:
+    partition_pdf = None
+try:
+    from unstructured.partition.docx import partition_docx
+except Exception:
+    partition_docx = None
+
+
+def needs_process(filename: str) -> bool:
+    """True for CPU-heavy formats worth shipping to a worker process."""
+    name = filename.lower()
+    return (name.endswith(".pdf") and partition_pdf is not None) or (name.endswith(".docx") and partition_docx is not None)
+
+
+def extract_text(filename: str, raw: bytes) -> Tuple[str, str]:
+    """Return (detected type, plain text) for an uploaded file."""
+    name = filename.lower()
+    if name.endswith(".pdf") and partition_pdf:
+        elements = partition_pdf(file=io.BytesIO(raw))
+        return "pdf", "\n".join([getattr(el, "text", "") for el in elements if getattr(el, "text", "")])
+    if name.endswith(".docx") and partition_docx:
+        elements = partition_docx(file=io.BytesIO(raw))
+        return "docx", "\n".join([getattr(el, "text", "") for el in elements if getattr(el, "text", "")])
+    if name.endswith(".csv"):
+        txt = raw.decode(errors="ignore")
+        return "csv", "\n".join([", ".join(r) for r in csv.reader(io.StringIO(txt))])
+    return "txt", raw.decode(errors="ignore")
@@ -0,0 +1,73 @@
+import base64
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import orjson
+
+
+def _pack(v: Any) -> Any:
+    # Keep the Python type so the value binds exactly as it came out of Postgres
+    if isinstance(v, Decimal):
+        return {"n": str(v)}
+    if isinstance(v, datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    return v
+
+
+def _unpack(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "n" in v:
+            return Decimal(v["n"])
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+    return v
+
+
+def scope(key_text: str) -> str:
+    """Short fingerprint tying a cursor to the query that produced it."""
+    return hashlib.sha256(key_text.encode()).hexdigest()[:16]
+
+
+def encode_cursor(scope: str, columns: List[str | None], row: Dict[str, Any]) -> str:
+    """Opaque cursor for the page after ``row``; columns are [ordering column or None, primary key]."""
+    order_col, pk_col = columns
+    payload: Dict[str, Any] = {"s": scope, "k": _pack(row[pk_col])}
+    if order_col:
+        payload["o"] = _pack(row[order_col])
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str) -> Dict[str, Any]:
+    """Returns {"k": pk[, "o": ordering value]}; raises ValueError if the cursor is not for this query."""
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(payload, dict) or payload.get("s") != scope or "k" not in payload:
+        raise ValueError("cursor does not belong to this query")
+    out = {"k": _unpack(payload["k"])}
+    if "o" in payload:
+        out["o"] = _unpack(payload["o"])
+    return out
+
+
+def keyset_shape(after: Dict[str, Any] | None) -> str:
+    """Plan shape for a page: first page, after a row, or after a row whose ordering value is NULL."""
+    if after is None:
+        return "first"
+    return "after_null" if "o" in after and after["o"] is None else "after"
+
+
+def keyset_params(after: Dict[str, Any] | None) -> Dict[str, Any]:
+    if after is None:
+        return {}
+    params = {"after_pk": after["k"]}
+    if after.get("o") is not None:
+        params["after_order"] = after["o"]
+    return params
@@ -0,0 +1,29 @@
+"""
+Keyword tables shared by query classification, the semantic parser and
+query normalization. All entries are lowercase and matched as substrings.
+"""
+
+# QueryEngine._classify
+DOC_KEYWORDS = ["resume", "cv", "document", "review", "pdf"]
+SQL_KEYWORDS = [
+    "count", "list", "average", "avg", "sum", "top", "hired", "joined", "trend", "month",
+    "salary", "department", "dept", "division", "divisions", "manager", "reports to",
+    "before", "after", "location", "mumbai", "bangalore", "chennai", "delhi", "hyderabad",
+    "pay", "compensation", "how many", "show", "employees", "staff"
+]
+
+# QueryParser
+AGG_FUNCTIONS = {'average': 'AVG', 'avg': 'AVG', 'sum': 'SUM', 'max': 'MAX', 'min': 'MIN'}
+ORG_GROUPING = ['department', 'dept', 'division', 'by department', 'per department', 'each department', 'in each department']
+LOCATION_GROUPING = ['city', 'location', 'by city', 'by location']
+REPORTS_TO_KEYWORDS = ['reports to', 'reporting to', 'managed by']
+
+# Words the tables above treat as interchangeable, mapped to the canonical
+# form. Only groups whose members classify and parse identically belong here.
+SYNONYMS = {
+    "average": ["avg"],
+    "department": ["dept", "division"],
+    "departments": ["depts", "divisions"],
+    "salary": ["pay", "compensation"],
+    "employees": ["staff"],
+}
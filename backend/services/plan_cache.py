@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from services.query_parser import QueryParser
+from services.sql_builder import SQLBuilder
+
+_NUM_RE = re.compile(r"\d+")
+NAME_SLOT = "\x00"
+NUM_SLOT = "\x01"
+
+# Stand-ins used to learn which bind parameter comes from which slot
+_PROBE_NAME = "Qzxv"
+_PROBE_NUM = 7919
+
+# Pseudo-bindings the engine needs for pagination: the parser's LIMIT and
+# the keyset columns the builder chose. Returned as plan metadata, not params.
+INTENT_LIMIT = "__intent_limit"
+KEYSET_COLUMNS = "__keyset_columns"
+META = {INTENT_LIMIT: "limit", KEYSET_COLUMNS: "keyset_columns"}
+
+
+def template(query: str, parser: QueryParser) -> Tuple[str, List[Any]]:
+    """
+    Replace the literals a plan can depend on with slots.
+    Returns (template, slot values): the person name (only in reports-to
+    queries, the one place it reaches SQL) and every non-zero number.
+    """
+    slots: List[Any] = []
+    name = None
+    if any(kw in query.lower() for kw in parser.REPORTS_TO_KEYWORDS):
+        name = parser._extract_person_name(query)
+    if name:
+        query = re.sub(rf"\b{re.escape(name)}\b", NAME_SLOT, query)
+        slots.append(name)
+
+    def num(m: re.Match) -> str:
+        value = int(m.group(0))
+        if not value:
+            # Zero disables filters ("if num:"), so it is part of the shape
+            return m.group(0)
+        slots.append(value)
+        return NUM_SLOT
+
+    return _NUM_RE.sub(num, query), slots
+
+
+def _fill(tmpl: str, slots: List[Any]) -> str:
+    it = iter(slots)
+    return re.sub(f"[{NAME_SLOT}{NUM_SLOT}]", lambda m: str(next(it)), tmpl)
+
+
+def _probe_slots(slots: List[Any]) -> List[Any]:
+    return [_PROBE_NAME if isinstance(v, str) else _PROBE_NUM + i for i, v in enumerate(slots)]
+
+
+def _spec(value: Any, probes: List[Any]) -> tuple:
+    """How a binding derives from the slots, learned from its probe value."""
+    for i, p in enumerate(probes):
+        if isinstance(p, str):
+            if isinstance(value, str) and p in value:
+                before, _, after = value.partition(p)
+                return ("str", i, before, after)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            if value == p:
+                return ("num", i, 1)
+            if value == p * 1000:
+                return ("num", i, 1000)
+    return ("const", value)
+
+
+def _bind(spec: tuple, slots: List[Any]) -> Any:
+    if spec[0] == "num":
+        return slots[spec[1]] * spec[2]
+    if spec[0] == "str":
+        return spec[2] + slots[spec[1]] + spec[3]
+    return spec[1]
+
+
+class PlanCache:
+    """
+    Caches parsed plans by query template. Queries differing only in a number
+    or a reports-to name share one entry holding the SQL text and how each bind
+    parameter derives from the slots; a hit rebinds the literals and skips
+    parse_intent/build_sql.
+
+    On a miss the template is also planned with probe literals: the probe must
+    produce the same SQL, and rebinding from it must reproduce the real
+    parameters, otherwise the template is marked uncacheable. Entries are
+    dropped whenever the schema version changes.
+    """
+    max_items = int(os.getenv("PLAN_CACHE_SIZE", "2048"))
+
+    _plans: "OrderedDict[str, tuple | None]" = OrderedDict()  # template|keyset -> (sql, specs) | None
+    _schema_version: Any = None
+    _lock = threading.Lock()
+    counters: Dict[str, int] = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+    @classmethod
+    def plan(cls, query: str, schema: dict, schema_version: Any, parser: QueryParser,
+             builder: SQLBuilder, keyset: str | None = None) -> Tuple[str, Dict[str, Any], Dict[str, Any], bool]:
+        """
+        Returns (sql, params, meta, hit); meta holds the intent limit and the
+        keyset columns. ``keyset`` is the page shape to plan for (see
+        SQLBuilder._keyset), or None for OFFSET paging.
+        """
+        tmpl, slots = template(query, parser)
+        key = f"{tmpl}|{keyset}"
+        with cls._lock:
+            if schema_version != cls._schema_version:
+                cls._plans.clear()
+                cls._schema_version = schema_version
+            entry = cls._plans.get(key, False)
+            if entry:
+                cls._plans.move_to_end(key)
+                cls.counters["hits"] += 1
+            else:
+                cls.counters["misses"] += 1
+
+        if entry:
+            sql, specs = entry
+            bindings = {k: _bind(s, slots) for k, s in specs.items()}
+            return (sql, *cls._split(bindings), True)
+
+        sql, bindings = cls._build(query, schema, parser, builder, keyset)
+        if entry is None:
+            # Known uncacheable template
+            return (sql, *cls._split(bindings), False)
+
+        stored = None
+        if slots:
+            probes = _probe_slots(slots)
+            try:
+                probe_sql, probe_bindings = cls._build(_fill(tmpl, probes), schema, parser, builder, keyset)
+                specs = {k: _spec(v, probes) for k, v in probe_bindings.items()}
+                if probe_sql == sql and {k: _bind(s, slots) for k, s in specs.items()} == bindings:
+                    stored = (sql, specs)
+            except Exception:
+                # The probe literals broke parsing/building; the real query
+                # planned fine, so answer it and just don't cache the template
+                pass
+        else:
+            stored = (sql, {k: ("const", v) for k, v in bindings.items()})
+
+        with cls._lock:
+            if stored is None:
+                cls.counters["uncacheable"] += 1
+            if schema_version == cls._schema_version:
+                cls._plans[key] = stored
+                while len(cls._plans) > cls.max_items:
+                    cls._plans.popitem(last=False)
+        return (sql, *cls._split(bindings), False)
+
+    @staticmethod
+    def _build(query: str, schema: dict, parser: QueryParser, builder: SQLBuilder,
+               keyset: str | None) -> Tuple[str, Dict[str, Any]]:
+        intent = parser.parse_intent(query, schema)
+        intent['keyset'] = keyset
+        sql, params = builder.build_sql(intent, schema)
+        return sql, {**params, INTENT_LIMIT: intent.get('limit'), KEYSET_COLUMNS: intent.get('keyset_columns')}
+
+    @staticmethod
+    def _split(bindings: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        meta = {name: bindings.pop(key) for key, name in META.items()}
+        return bindings, meta
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._plans.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        lookups = cls.counters["hits"] + cls.counters["misses"]
+        return {
+            **cls.counters,
+            "hit_rate": round(cls.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "templates": len(cls._plans),
+            "max_items": cls.max_items,
+        }
@@ -1,17 +1,36 @@
 import os
+import asyncio
 import hashlib
-from typing import Dict, Any, List
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from time import perf_counter
+from typing import Dict, Any, List, Tuple, Iterator, AsyncIterator
 
-import orjson
-from redis import Redis
 from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
 
-from models.db import engine as get_engine
+from models.db import engine as get_engine, async_engine as get_async_engine
 from services.schema_discovery import SchemaDiscovery, SchemaCache
-from services.document_processor import VectorStore
+from services.schema_store import SchemaStore
+from services.embeddings import EmbeddingCache
+from services.search_batcher import SearchBatcher
+from services.result_cache import CacheVersion, ResultCache, QUERY_DEPENDS
+from services.serialization import dumps
+from services.plan_cache import PlanCache
+from services.keywords import DOC_KEYWORDS, SQL_KEYWORDS
+from services.query_normalizer import normalize, normalize_search
+from services.keyset import scope as cursor_scope, encode_cursor, decode_cursor, keyset_shape, keyset_params
 from services.query_parser import QueryParser
 from services.sql_builder import SQLBuilder
+from logger import logger
+
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "1000"))
+
+# Hybrid queries run both branches at once; a branch over budget is dropped from the answer
+HYBRID_SQL_TIMEOUT_MS = float(os.getenv("HYBRID_SQL_TIMEOUT_MS", "3000"))
+HYBRID_DOC_TIMEOUT_MS = float(os.getenv("HYBRID_DOC_TIMEOUT_MS", "3000"))
+HYBRID_WORKERS = int(os.getenv("HYBRID_WORKERS", "16"))
+# Batch SQL gets its own pool so a large batch cannot starve hybrid branches
+QUERY_BATCH_WORKERS = int(os.getenv("QUERY_BATCH_WORKERS", "4"))
 
 
 class QueryHistory:
@@ -27,21 +46,16 @@ class QueryHistory:
 
 
 class QueryEngine:
+    _branch_pool = ThreadPoolExecutor(max_workers=HYBRID_WORKERS, thread_name_prefix="hybrid")
+    _batch_pool = ThreadPoolExecutor(max_workers=QUERY_BATCH_WORKERS, thread_name_prefix="batch")
+
     def __init__(self):
         self.conn_str = os.getenv("DATABASE_URL")
         if not self.conn_str:
             raise RuntimeError("DATABASE_URL not set")
 
-        self.redis = Redis(
-            host=os.getenv("REDIS_HOST", "localhost"),
-            port=int(os.getenv("REDIS_PORT", "6379")),
-            db=int(os.getenv("REDIS_DB", "0")),
-            decode_responses=True,
-        )
-        self.cache_ttl = int(os.getenv("REDIS_TTL", "300"))
-
-        self.embed_model_name = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        self._embedder: SentenceTransformer | None = None
+        # Async mode: /api/query awaits process_query_async (asyncpg + redis.asyncio)
+        self.async_mode = os.getenv("QUERY_ASYNC", "0") == "1"
 
         self.eng = get_engine()
         self.discovery = SchemaDiscovery()
@@ -51,126 +65,483 @@ class QueryEngine:
         self.sql_builder = SQLBuilder()
         
         if not SchemaCache.get():
-            SchemaCache.set(self.discovery.analyze_database(self.conn_str))
+            # Another worker (or a previous run) usually has it already
+            SchemaStore.load_or_discover(lambda: self.discovery.analyze_database(self.conn_str), self.conn_str)
+        SchemaStore.start()
 
-    # Cache keys
-    def _cache_version(self) -> str:
-        try:
-            return self.redis.get("cache_version") or "0"
-        except Exception:
-            return "0"
+        CacheVersion.start()
 
-    def _cache_key(self, q: str, limit: int, offset: int) -> str:
-        ver = self._cache_version()
-        return "q:" + hashlib.sha256(f"{ver}|{q}|{limit}|{offset}".encode()).hexdigest()
+    # Cache keys
+    def _cache_key(self, q: str, qtype: str, limit: int, offset: int, cursor: str | None = None,
+                   ver: str | None = None) -> str:
+        # Only the namespaces this query type reads from go into the key, so a
+        # document ingest leaves pure-SQL entries reachable (and vice versa).
+        # Versions come from local memory (pub/sub): no network hop per key.
+        # Async callers pass ``ver`` from CacheVersion.aget.
+        if ver is None:
+            ver = CacheVersion.get(QUERY_DEPENDS[qtype])
+        return "q:" + hashlib.sha256(f"{ver}|{q}|{limit}|{offset}|{cursor or ''}".encode()).hexdigest()
 
     # Public API
-    def process_query(self, user_query: str, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    def process_query(self, user_query: str, limit: int = 50, offset: int = 0,
+                      cursor: str | None = None) -> Dict[str, Any]:
         schema = SchemaCache.get() or self.discovery.analyze_database(self.conn_str)
 
+        # Canonicalize so trivially different phrasings share a cache entry;
+        # the type decides which cache namespaces apply
+        user_query, search_query, key_text, qtype = self._normalize(user_query)
+        tags = QUERY_DEPENDS[qtype]
+
         # Check cache
-        ckey = self._cache_key(user_query, limit, offset)
-        cached = None
-        try:
-            cached = self.redis.get(ckey)
-        except Exception:
-            cached = None
-        
+        ckey = self._cache_key(key_text, qtype, limit, offset, cursor)
+        cached = ResultCache.get(ckey, tags)
         if cached:
-            try:
-                out = orjson.loads(cached.encode())
-            except Exception:
-                out = {"query_type": "cached", "results": {}, "performance_metrics": {}}
-            out.setdefault("performance_metrics", {})
-            out["performance_metrics"]["cache_hit"] = True
-            return out
-
-        # Classify query
-        qtype = self._classify(user_query)
+            return cached
 
         results: Dict[str, Any] = {}
+        metrics: Dict[str, Any] = {"cache_hit": False, "stages_ms": {}}
+        branches: Dict[str, Any] = {}
         
         # Execute SQL queries using semantic parser
         if qtype in ("sql", "hybrid"):
-            results["table"] = self._run_sql_semantic(user_query, schema, limit, offset)
+            sql_metrics: Dict[str, Any] = {}
+            branches["sql"] = ((self._run_sql_semantic, user_query, schema, limit, offset, sql_metrics,
+                                cursor, cursor_scope(key_text)), sql_metrics)
         
         # Execute document search
         if qtype in ("documents", "hybrid"):
-            results["documents"] = self._search_documents(user_query, top_k=3)
+            doc_metrics: Dict[str, Any] = {}
+            branches["documents"] = ((self._search_documents, search_query, 3, doc_metrics), doc_metrics)
 
-        out = {"query_type": qtype, "results": results, "performance_metrics": {"cache_hit": False}}
+        if qtype == "hybrid":
+            # Independent branches (Postgres wait vs embedding CPU): run them side by side
+            runs = {name: self._submit_branch(call) for name, (call, _) in branches.items()}
+            for name, run in runs.items():
+                value, ms, timed_out = self._wait_branch(*run, self._branch_timeout(name))
+                self._merge_branch(name, value, ms, timed_out, branches, results, metrics)
+        else:
+            for name, (call, _) in branches.items():
+                value, ms = self._timed(*call)
+                self._merge_branch(name, value, ms, False, branches, results, metrics)
 
-        # Cache result
-        try:
-            self.redis.setex(ckey, self.cache_ttl, orjson.dumps(out).decode())
-        except Exception:
-            pass
+        next_cursor = results.pop("next_cursor", None)
+        out = {"query_type": qtype, "results": results, "next_cursor": next_cursor, "performance_metrics": metrics}
+
+        # Cache result (partial answers are not cached)
+        if not metrics.get("timed_out"):
+            ResultCache.put(ckey, out, tags)
 
         return out
 
+    async def process_query_async(self, user_query: str, limit: int = 50, offset: int = 0,
+                                  cursor: str | None = None) -> Dict[str, Any]:
+        """
+        Same contract as process_query, but database and Redis I/O are awaited
+        and embedding/search runs off the event loop, so one worker can keep
+        many queries in flight.
+        """
+        schema = SchemaCache.get()
+        if not schema:
+            schema = await asyncio.to_thread(self.discovery.analyze_database, self.conn_str)
+        user_query, search_query, key_text, qtype = self._normalize(user_query)
+        tags = QUERY_DEPENDS[qtype]
+        ckey = self._cache_key(key_text, qtype, limit, offset, cursor, await CacheVersion.aget(tags))
+        cached = await ResultCache.aget(ckey, tags)
+        if cached:
+            return cached
+        results: Dict[str, Any] = {}
+        metrics: Dict[str, Any] = {"cache_hit": False, "stages_ms": {}}
+        branches: Dict[str, Any] = {}
+
+        if qtype in ("sql", "hybrid"):
+            sql_metrics: Dict[str, Any] = {}
+            branches["sql"] = (self._run_sql_async(user_query, schema, limit, offset, sql_metrics,
+                                                   cursor, cursor_scope(key_text)), sql_metrics)
+
+        if qtype in ("documents", "hybrid"):
+            doc_metrics: Dict[str, Any] = {}
+            branches["documents"] = (asyncio.to_thread(self._search_documents, search_query, 3, doc_metrics), doc_metrics)
+
+        hybrid = qtype == "hybrid"
+        done = await asyncio.gather(*(
+            self._await_branch(aw, self._branch_timeout(name) if hybrid else None) for name, (aw, _) in branches.items()
+        ))
+        for name, (value, ms, timed_out) in zip(branches, done):
+            self._merge_branch(name, value, ms, timed_out, branches, results, metrics)
+
+        next_cursor = results.pop("next_cursor", None)
+        out = {"query_type": qtype, "results": results, "next_cursor": next_cursor, "performance_metrics": metrics}
+        if not metrics.get("timed_out"):
+            await ResultCache.aput(ckey, out, tags)
+        return out
+
+    # Batch API
+    def process_batch(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Many queries in one call (dashboards, reports). Identical queries run
+        once, cache hits resolve through one MGET, document searches share one
+        embedding batch and SQL misses run concurrently on the batch pool.
+        Returns (one response per item, in order; batch metrics).
+        """
+        t0 = perf_counter()
+        schema = SchemaCache.get() or self.discovery.analyze_database(self.conn_str)
+        order, jobs = self._batch_jobs(items)
+        outs = ResultCache.get_many([(k, j["tags"]) for k, j in jobs.items()])
+        misses = {k: j for k, j in jobs.items() if k not in outs}
+
+        # SQL goes to the pool first so it overlaps the embedding batch below
+        futs = {
+            k: self._batch_pool.submit(self._timed, self._run_sql_semantic, j["query"], schema, j["limit"],
+                                        j["offset"], j["metrics"], j["cursor"], j["scope"])
+            for k, j in misses.items() if j["qtype"] in ("sql", "hybrid")
+        }
+        docs = self._batch_documents(misses)
+        sql: Dict[str, Any] = {}
+        for k, fut in futs.items():
+            try:
+                sql[k] = fut.result()
+            except Exception as e:
+                sql[k] = e
+
+        fresh = self._finish_batch(misses, sql, docs)
+        ResultCache.put_many([(k, out, jobs[k]["tags"]) for k, out in fresh.items() if "error" not in out])
+        return self._batch_response(order, {**outs, **fresh}, len(jobs), len(misses), t0)
+
+    async def process_batch_async(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Same contract as process_batch on the asyncpg / redis.asyncio path."""
+        t0 = perf_counter()
+        schema = SchemaCache.get()
+        if not schema:
+            schema = await asyncio.to_thread(self.discovery.analyze_database, self.conn_str)
+        tokens = await asyncio.gather(*(CacheVersion.aget(tags) for tags in QUERY_DEPENDS.values()))
+        order, jobs = self._batch_jobs(items, dict(zip(QUERY_DEPENDS, tokens)))
+        outs = await ResultCache.aget_many([(k, j["tags"]) for k, j in jobs.items()])
+        misses = {k: j for k, j in jobs.items() if k not in outs}
+
+        sql_keys = [k for k, j in misses.items() if j["qtype"] in ("sql", "hybrid")]
+        docs, *done = await asyncio.gather(
+            asyncio.to_thread(self._batch_documents, misses),
+            *(self._await_branch(self._run_sql_async(misses[k]["query"], schema, misses[k]["limit"], misses[k]["offset"],
+                                                     misses[k]["metrics"], misses[k]["cursor"], misses[k]["scope"]), None)
+              for k in sql_keys),
+            return_exceptions=True,
+        )
+        sql = {k: r if isinstance(r, Exception) else r[:2] for k, r in zip(sql_keys, done)}
+        if isinstance(docs, Exception):
+            docs = {k: docs for k, j in misses.items() if j["qtype"] in ("documents", "hybrid")}
+
+        fresh = self._finish_batch(misses, sql, docs)
+        await ResultCache.aput_many([(k, out, jobs[k]["tags"]) for k, out in fresh.items() if "error" not in out])
+        return self._batch_response(order, {**outs, **fresh}, len(jobs), len(misses), t0)
+
+    def _batch_jobs(self, items: List[Dict[str, Any]],
+                    versions: Dict[str, str] | None = None) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """
+        Normalize, classify and key every item; items sharing a cache key
+        become one job. ``versions`` (query type -> version token) is passed
+        by the async path so keying never does a blocking Redis read.
+        """
+        order: List[str] = []
+        jobs: Dict[str, Dict[str, Any]] = {}
+        for it in items:
+            query, search_query, key_text, qtype = self._normalize(it["query"])
+            limit, offset, cursor = it.get("limit", 50), it.get("offset", 0), it.get("cursor")
+            ckey = self._cache_key(key_text, qtype, limit, offset, cursor, versions[qtype] if versions else None)
+            order.append(ckey)
+            if ckey not in jobs:
+                jobs[ckey] = {
+                    "query": query, "search": search_query, "qtype": qtype, "tags": QUERY_DEPENDS[qtype],
+                    "limit": limit, "offset": offset, "cursor": cursor, "scope": cursor_scope(key_text),
+                    "metrics": {"cache_hit": False, "stages_ms": {}},
+                }
+        return order, jobs
+
+    def _batch_documents(self, misses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """One embedding batch + one index search for every document/hybrid miss."""
+        keys = [k for k, j in misses.items() if j["qtype"] in ("documents", "hybrid")]
+        if not keys:
+            return {}
+        t0 = perf_counter()
+        try:
+            found = SearchBatcher.search_many([misses[k]["search"] for k in keys], 3)
+        except Exception as e:
+            return {k: e for k in keys}
+        ms = round((perf_counter() - t0) * 1000, 1)
+        return {k: (hits, tier, ms) for k, (hits, tier) in zip(keys, found)}
+
+    @staticmethod
+    def _finish_batch(misses: Dict[str, Dict[str, Any]], sql: Dict[str, Any], docs: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        fresh: Dict[str, Dict[str, Any]] = {}
+        for k, j in misses.items():
+            results: Dict[str, Any] = {}
+            metrics, next_cursor = j["metrics"], None
+            try:
+                if k in sql:
+                    if isinstance(sql[k], Exception):
+                        raise sql[k]
+                    (results["table"], next_cursor), metrics["stages_ms"]["sql"] = sql[k]
+                if k in docs:
+                    if isinstance(docs[k], Exception):
+                        raise docs[k]
+                    results["documents"], metrics["embedding_cache"], metrics["stages_ms"]["documents"] = docs[k]
+            except Exception as e:
+                # One bad query must not fail the whole batch
+                fresh[k] = {"query_type": j["qtype"], "error": str(e), "performance_metrics": metrics}
+                continue
+            fresh[k] = {"query_type": j["qtype"], "results": results, "next_cursor": next_cursor, "performance_metrics": metrics}
+        return fresh
+
+    @staticmethod
+    def _batch_response(order: List[str], outs: Dict[str, Dict[str, Any]], unique: int, executed: int,
+                        t0: float) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        batch_metrics = {
+            "queries": len(order),
+            "unique": unique,
+            "cache_hits": unique - executed,
+            "executed": executed,
+            "embedding_cache_counters": dict(EmbeddingCache.counters),
+            "total_ms": round((perf_counter() - t0) * 1000, 1),
+        }
+        return [outs[k] for k in order], batch_metrics
+
+    # Branch helpers
+    @staticmethod
+    def _branch_timeout(name: str) -> float:
+        return HYBRID_SQL_TIMEOUT_MS if name == "sql" else HYBRID_DOC_TIMEOUT_MS
+
+    @staticmethod
+    def _timed(fn, *args) -> Tuple[Any, float]:
+        t0 = perf_counter()
+        value = fn(*args)
+        return value, round((perf_counter() - t0) * 1000, 1)
+
+    def _submit_branch(self, call: tuple) -> Tuple[Any, threading.Event, List[float]]:
+        """Queue a hybrid branch; the event fires, with its start time recorded, once a thread picks it up."""
+        ready = threading.Event()
+        started: List[float] = []
+
+        def run():
+            started.append(perf_counter())
+            ready.set()
+            return self._timed(*call)
+
+        return self._branch_pool.submit(run), ready, started
+
+    @staticmethod
+    def _wait_branch(fut, ready: threading.Event, started: List[float], timeout_ms: float) -> Tuple[Any, float, bool]:
+        """
+        Wait for a branch submitted by _submit_branch. Its budget runs from
+        when it starts, not from submit, so time queued behind other
+        requests' branches is not charged to it; a branch still queued after
+        a full budget is cancelled so it never takes a thread.
+        """
+        budget = timeout_ms / 1000
+        t0 = perf_counter()
+        if not ready.wait(budget) and fut.cancel():
+            return None, round((perf_counter() - t0) * 1000, 1), True
+        ready.wait()  # cancel() lost the race: it is running now
+        try:
+            value, ms = fut.result(timeout=max(0.0, started[0] + budget - perf_counter()))
+            return value, ms, False
+        except FutureTimeout:
+            return None, round((perf_counter() - started[0]) * 1000, 1), True
+
+    @staticmethod
+    async def _await_branch(aw, timeout_ms: float | None) -> Tuple[Any, float, bool]:
+        t0 = perf_counter()
+        try:
+            value = await (asyncio.wait_for(aw, timeout_ms / 1000) if timeout_ms else aw)
+            return value, round((perf_counter() - t0) * 1000, 1), False
+        except asyncio.TimeoutError:
+            return None, round((perf_counter() - t0) * 1000, 1), True
+
+    @staticmethod
+    def _merge_branch(name: str, value: Any, ms: float, timed_out: bool, branches: Dict[str, Any],
+                      results: Dict[str, Any], metrics: Dict[str, Any]) -> None:
+        """
+        Fold one branch into the response. Each branch writes its own metrics
+        dict; a timed-out branch's is never read, since its thread may still
+        be running.
+        """
+        metrics["stages_ms"][name] = ms
+        if timed_out:
+            metrics.setdefault("timed_out", []).append(name)
+            return
+        metrics.update(branches[name][1])
+        if name == "sql":
+            results["table"], results["next_cursor"] = value
+        else:
+            results["documents"] = value
+
+    # Streaming export
+    def stream_query(self, user_query: str, max_rows: int | None = None) -> Iterator[bytes] | AsyncIterator[bytes]:
+        """
+        NDJSON export of the SQL side of a query: a header line, one line per
+        row as Postgres hands it over (server-side cursor, STREAM_BATCH_ROWS at
+        a time), then a trailer with the row count and time to first row.
+        Nothing is paginated or cached. Planning happens here, so bad queries
+        fail before the first byte; iterating the result runs the SQL.
+        """
+        t0 = perf_counter()
+        schema = SchemaCache.get() or self.discovery.analyze_database(self.conn_str)
+        user_query, _ = normalize(user_query)
+        qtype = self._classify(user_query)
+        if qtype == "documents":
+            raise ValueError("streaming is only available for SQL queries")
+        sql, params, _, _ = PlanCache.plan(user_query, schema, SchemaCache.version(), self.parser, self.sql_builder)
+        if max_rows and ' LIMIT ' not in sql.upper():
+            sql = f"{sql} LIMIT {max(1, int(max_rows))}"
+        if self.async_mode:
+            return self._stream_rows_async(qtype, sql, params, t0)
+        return self._stream_rows(qtype, sql, params, t0)
+
+    def _stream_rows(self, qtype: str, sql: str, params: Dict[str, Any], t0: float) -> Iterator[bytes]:
+        first_row_ms, n = None, 0
+        with self.eng.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_ROWS).execute(text(sql), params)
+            yield self._stream_line({"type": "header", "query_type": qtype, "columns": list(result.keys())})
+            for part in result.mappings().partitions():
+                if first_row_ms is None:
+                    first_row_ms = round((perf_counter() - t0) * 1000, 1)
+                n += len(part)
+                yield b"".join([dumps(dict(r)) + b"\n" for r in part])
+        yield self._stream_trailer(n, first_row_ms, t0)
+
+    async def _stream_rows_async(self, qtype: str, sql: str, params: Dict[str, Any], t0: float) -> AsyncIterator[bytes]:
+        first_row_ms, n = None, 0
+        async with get_async_engine().connect() as conn:
+            result = await conn.stream(text(sql), params, execution_options={"yield_per": STREAM_BATCH_ROWS})
+            yield self._stream_line({"type": "header", "query_type": qtype, "columns": list(result.keys())})
+            async for part in result.mappings().partitions(STREAM_BATCH_ROWS):
+                if first_row_ms is None:
+                    first_row_ms = round((perf_counter() - t0) * 1000, 1)
+                n += len(part)
+                yield b"".join([dumps(dict(r)) + b"\n" for r in part])
+        yield self._stream_trailer(n, first_row_ms, t0)
+
+    @staticmethod
+    def _stream_line(obj: Dict[str, Any]) -> bytes:
+        return dumps(obj) + b"\n"
+
+    def _stream_trailer(self, rows: int, first_row_ms: float | None, t0: float) -> bytes:
+        total_ms = round((perf_counter() - t0) * 1000, 1)
+        logger.info(f"[stream] rows={rows} time_to_first_row_ms={first_row_ms} total_ms={total_ms}")
+        return self._stream_line({"type": "trailer", "rows": rows, "time_to_first_row_ms": first_row_ms, "total_ms": total_ms})
+
     # Classify query type
+    def _normalize(self, query: str) -> Tuple[str, str, str, str]:
+        """
+        (SQL query, document search query, cache key text, query type). Only
+        SQL text is canonicalized; anything that reaches document search is
+        keyed on the text it embeds.
+        """
+        sql_query, key_text = normalize(query)
+        qtype = self._classify(sql_query)
+        search_query = sql_query
+        if qtype != "sql":
+            search_query, key_text = normalize_search(query)
+        return sql_query, search_query, key_text, qtype
+
     def _classify(self, q: str) -> str:
         ql = q.lower()
-        is_doc = any(k in ql for k in ["resume", "cv", "document", "review", "pdf"])
-        is_sql = any(k in ql for k in [
-            "count", "list", "average", "avg", "sum", "top", "hired", "joined", "trend", "month",
-            "salary", "department", "dept", "division", "divisions", "manager", "reports to",
-            "before", "after", "location", "mumbai", "bangalore", "chennai", "delhi", "hyderabad",
-            "pay", "compensation", "how many", "show", "employees", "staff"
-        ])
+        is_doc = any(k in ql for k in DOC_KEYWORDS)
+        is_sql = any(k in ql for k in SQL_KEYWORDS)
         if is_doc and is_sql:
             return "hybrid"
         return "documents" if is_doc else "sql"
 
     # NEW: Semantic SQL generation with CRITICAL FIX
-    def _run_sql_semantic(self, query: str, schema: dict, limit: int, offset: int) -> List[dict]:
+    def _run_sql_semantic(self, query: str, schema: dict, limit: int, offset: int,
+                          metrics: Dict[str, Any] | None = None, cursor: str | None = None,
+                          scope: str = "") -> Tuple[List[dict], str | None]:
         """
         Generate and execute SQL using semantic parser
         NO hardcoded patterns
+        Returns (rows, next_cursor)
         """
-        # Parse query into intent
-        intent = self.parser.parse_intent(query, schema)
-        
-        # Build SQL from intent
-        sql, params = self.sql_builder.build_sql(intent, schema)
+        sql, params, page = self._plan_sql(query, schema, limit, offset, metrics, cursor, scope)
+        return self._next_page(self._exec(sql, params), page)
+
+    def _plan_sql(self, query: str, schema: dict, limit: int, offset: int,
+                  metrics: Dict[str, Any] | None = None, cursor: str | None = None,
+                  scope: str = "") -> Tuple[str, Dict[str, Any], Dict[str, Any] | None]:
+        """
+        Parse the query and build paginated, parameterized SQL (no I/O).
+        Plans are reused across queries that differ only in literals.
+
+        List queries page by keyset (seek past the cursor row) unless the
+        client asked for an explicit OFFSET; everything else keeps OFFSET.
+        Returns (sql, params, page), page being set for keyset pages.
+        """
+        after = decode_cursor(cursor, scope) if cursor else None
+        # OFFSET pages still plan with the keyset ORDER BY so they line up with keyset pages
+        shape = keyset_shape(after) if cursor or not offset else "offset"
+
+        # Parse query into intent and build SQL (or rebind a cached plan)
+        sql, params, meta, hit = PlanCache.plan(
+            query, schema, SchemaCache.version(), self.parser, self.sql_builder, keyset=shape
+        )
+        if metrics is not None:
+            metrics["plan_cache_hit"] = hit
+
+        if meta["keyset_columns"]:
+            size = self._page_size(limit)
+            params = {**params, **keyset_params(after)}
+            # One look-ahead row tells whether a next page exists
+            return f"{sql} LIMIT {size + 1}", params, {"columns": meta["keyset_columns"], "size": size, "scope": scope}
+        if cursor:
+            raise ValueError("cursor pagination is only available for list queries")
         
         # CRITICAL FIX: Only add pagination if SQL doesn't already have LIMIT
         if ' LIMIT ' not in sql.upper():
-            sql = self._paginate(sql, intent.get('limit') or limit, offset)
+            sql = self._paginate(sql, meta["limit"] or limit, offset)
         
-        # Execute
-        return self._exec(sql, params)
+        return sql, params, None
+
+    async def _run_sql_async(self, query: str, schema: dict, limit: int, offset: int,
+                             metrics: Dict[str, Any], cursor: str | None, scope: str) -> Tuple[List[dict], str | None]:
+        sql, params, page = self._plan_sql(query, schema, limit, offset, metrics, cursor, scope)
+        return self._next_page(await self._exec_async(sql, params), page)
+
+    def _next_page(self, rows: List[dict], page: Dict[str, Any] | None) -> Tuple[List[dict], str | None]:
+        """Drop the look-ahead row and encode the cursor of the last row returned."""
+        if not page or len(rows) <= page["size"]:
+            return rows, None
+        rows = rows[:page["size"]]
+        return rows, encode_cursor(page["scope"], page["columns"], rows[-1])
 
     def _exec(self, sql: str, params: Dict[str, Any]) -> List[dict]:
         """
         Execute SQL with parameters
         """
+        # One pass over the cursor: no intermediate list of RowMappings
         with self.eng.connect() as conn:
-            rows = conn.execute(text(sql), params).mappings().all()
-        return [dict(r) for r in rows]
+            return [dict(r) for r in conn.execute(text(sql), params).mappings()]
+
+    async def _exec_async(self, sql: str, params: Dict[str, Any]) -> List[dict]:
+        """
+        Execute SQL with parameters on the asyncpg engine
+        """
+        async with get_async_engine().connect() as conn:
+            result = await conn.execute(text(sql), params)
+            return [dict(r) for r in result.mappings()]
 
     def _paginate(self, sql: str, limit: int, offset: int) -> str:
         """
         Add LIMIT and OFFSET to SQL
         """
-        l = max(1, min(int(limit), 200))
+        l = self._page_size(limit)
         o = max(0, int(offset))
         return f"{sql} LIMIT {l} OFFSET {o}"
 
+    @staticmethod
+    def _page_size(limit: int) -> int:
+        return max(1, min(int(limit), 200))
+
     # Embeddings
-    def _ensure_embedder(self) -> SentenceTransformer:
-        if self._embedder is None:
-            self._embedder = SentenceTransformer(self.embed_model_name)
-        return self._embedder
-
-    def _search_documents(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-        embedder = self._ensure_embedder()
-        qvec = embedder.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype("float32")
-        D, I = VectorStore.index.search(qvec, top_k)
-        hits: List[Dict[str, Any]] = []
-        for idx, score in zip(I[0], D[0]):
-            if idx == -1:
-                continue
-            meta = VectorStore.meta[idx] if idx < len(VectorStore.meta) else {}
-            hits.append({"score": float(score), "meta": meta})
+    def _search_documents(self, query: str, top_k: int = 3, metrics: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        hits, tier = SearchBatcher.search(query, top_k)
+        if metrics is not None:
+            metrics["embedding_cache"] = tier
+            metrics["embedding_cache_counters"] = dict(EmbeddingCache.counters)
         return hits
@@ -0,0 +1,56 @@
+import os
+import re
+from typing import Tuple
+
+from services.keywords import REPORTS_TO_KEYWORDS, SYNONYMS
+
+ENABLED = os.getenv("QUERY_NORMALIZE", "1") == "1"
+
+# Punctuation becomes a space; apostrophes and hyphens inside words survive (O'Brien, Jean-Luc)
+_PUNCT_RE = re.compile(r"[^\w\s'-]|(?<!\w)['-]|['-](?!\w)")
+_CANONICAL = {syn: canon for canon, syns in SYNONYMS.items() for syn in syns}
+_SYNONYM_RE = re.compile(r"\b(" + "|".join(map(re.escape, _CANONICAL)) + r")\b", re.IGNORECASE)
+
+
+def _collapse(m: re.Match) -> str:
+    word = m.group(0)
+    canon = _CANONICAL[word.lower()]
+    return canon.capitalize() if word[0].isupper() else canon
+
+
+def canonical(query: str) -> str:
+    """Strip punctuation, collapse whitespace and map synonyms to their canonical word."""
+    text = " ".join(_PUNCT_RE.sub(" ", query).split())
+    return _SYNONYM_RE.sub(_collapse, text)
+
+
+def cache_text(text: str) -> str:
+    """
+    Case-fold a canonical query for keying. Reports-to queries keep their case:
+    the person name is read from capitalization and reaches the SQL.
+    """
+    tl = text.lower()
+    return text if any(kw in tl for kw in REPORTS_TO_KEYWORDS) else tl
+
+
+def normalize(query: str, enabled: bool | None = None) -> Tuple[str, str]:
+    """
+    Returns (query to execute, text to build the cache key from). The canonical
+    query is what runs, so every query sharing a key gets the same answer.
+    """
+    if not (ENABLED if enabled is None else enabled):
+        return query, query
+    text = canonical(query)
+    return text, cache_text(text)
+
+
+def normalize_search(query: str, enabled: bool | None = None) -> Tuple[str, str]:
+    """
+    normalize() for queries that reach document search. The text is embedded
+    and punctuation carries meaning there (C++ vs C#, Node.js, .NET), so only
+    whitespace and case are folded.
+    """
+    if not (ENABLED if enabled is None else enabled):
+        return query, query
+    text = " ".join(query.split())
+    return text, cache_text(text)
@@ -1,10 +1,15 @@
 from typing import Dict, Any, List, Optional, Tuple
 import re
 
+from services.keywords import AGG_FUNCTIONS, ORG_GROUPING, LOCATION_GROUPING, REPORTS_TO_KEYWORDS
+from services.schema_index import SchemaIndex
+
 
 class QueryParser:
     """Semantic query parser - handles all recruiter queries"""
     
+    REPORTS_TO_KEYWORDS = REPORTS_TO_KEYWORDS
+    
     def parse_intent(self, query: str, schema: dict) -> Dict[str, Any]:
         ql = query.lower().strip()
         
@@ -42,16 +47,13 @@ class QueryParser:
         return 'LIST'
     
     def _identify_target_tables(self, query: str, schema: dict) -> List[str]:
-        for table in schema.get('tables', []):
-            if table.get('semantic_tag') == 'primary_entity':
-                return [table['name']]
-        return [schema['tables'][0]['name']] if schema.get('tables') else []
+        idx = SchemaIndex.of(schema)
+        table = idx.table_by_tag('primary_entity') or idx.first_table
+        return [table] if table else []
     
     def _detect_aggregation(self, query: str, schema: dict, target_tables: List[str]) -> Optional[Dict]:
-        func_map = {'average': 'AVG', 'avg': 'AVG', 'sum': 'SUM', 'max': 'MAX', 'min': 'MIN'}
-        
         detected_func = None
-        for kw, func in func_map.items():
+        for kw, func in AGG_FUNCTIONS.items():
             if kw in query:
                 detected_func = func
                 break
@@ -59,13 +61,9 @@ class QueryParser:
         if not detected_func or not target_tables:
             return None
         
-        table = next((t for t in schema['tables'] if t['name'] == target_tables[0]), None)
-        if not table:
-            return None
-        
-        for col in table['columns']:
-            if col.get('semantic_tag') == 'numeric_measure':
-                return {'function': detected_func, 'column': col['name']}
+        col = SchemaIndex.of(schema).column(target_tables[0], 'numeric_measure')
+        if col:
+            return {'function': detected_func, 'column': col}
         
         return None
     
@@ -73,10 +71,10 @@ class QueryParser:
         if not aggregation:
             return None
         
-        if any(kw in query for kw in ['department', 'dept', 'division', 'by department', 'per department', 'each department', 'in each department']):
+        if any(kw in query for kw in ORG_GROUPING):
             return 'org'
         
-        if any(kw in query for kw in ['city', 'location', 'by city', 'by location']):
+        if any(kw in query for kw in LOCATION_GROUPING):
             return 'location'
         
         return None
@@ -87,29 +85,27 @@ class QueryParser:
         if not target_tables:
             return filters
         
-        table = next((t for t in schema['tables'] if t['name'] == target_tables[0]), None)
-        if not table:
+        idx = SchemaIndex.of(schema)
+        table = target_tables[0]
+        if not idx.table(table):
             return filters
         
         # Numeric filters
         if any(kw in query for kw in ['over', 'above', 'exceeds', 'greater', 'more than']):
             num = self._extract_number(query)
             if num:
-                col = next((c['name'] for c in table['columns'] 
-                          if c.get('semantic_tag') == 'numeric_measure'), None)
+                col = idx.column(table, 'numeric_measure')
                 if col:
                     filters.append({'column': col, 'operator': '>', 'value': num})
         
         # Date filters
         if 'this year' in query or 'hired this year' in query or 'joined this year' in query:
-            col = next((c['name'] for c in table['columns'] 
-                      if c.get('semantic_tag') == 'date'), None)
+            col = idx.column(table, 'date')
             if col:
                 filters.append({'column': col, 'operator': 'YEAR_EQUALS', 'value': 'CURRENT_YEAR'})
         
         if 'last year' in query:
-            col = next((c['name'] for c in table['columns'] 
-                      if c.get('semantic_tag') == 'date'), None)
+            col = idx.column(table, 'date')
             if col:
                 filters.append({'column': col, 'operator': 'YEAR_EQUALS', 'value': 'LAST_YEAR'})
         
@@ -127,13 +123,8 @@ class QueryParser:
         if not target_tables:
             return None
         
-        table = next((t for t in schema['tables'] if t['name'] == target_tables[0]), None)
-        if not table:
-            return None
-        
         if any(kw in query for kw in ['top', 'highest', 'largest']):
-            col = next((c['name'] for c in table['columns'] 
-                      if c.get('semantic_tag') == 'numeric_measure'), None)
+            col = SchemaIndex.of(schema).column(target_tables[0], 'numeric_measure')
             if col:
                 return {'column': col, 'direction': 'DESC'}
         
@@ -155,7 +146,7 @@ class QueryParser:
     
     def _detect_reports_to(self, query: str, person_name: Optional[str]) -> Optional[str]:
         """Detect 'who reports to X' queries"""
-        if any(kw in query for kw in ['reports to', 'reporting to', 'managed by']):
+        if any(kw in query for kw in self.REPORTS_TO_KEYWORDS):
             return person_name
         return None
     
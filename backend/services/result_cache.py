@@ -0,0 +1,345 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import orjson
+
+from logger import logger
+from models import redis_pool
+from services.serialization import dumps
+
+VERSION_KEY = "cache_version:{}"
+VERSION_CHANNEL = "cache_version_updates"
+
+# Cache namespaces: what a cached answer was derived from
+SQL = "sql"            # discovered schema and SQL data
+DOCUMENTS = "documents"  # the document corpus / VectorStore
+NAMESPACES = (SQL, DOCUMENTS)
+QUERY_DEPENDS = {"sql": (SQL,), "documents": (DOCUMENTS,), "hybrid": (SQL, DOCUMENTS)}
+
+
+class LocalLRU:
+    """
+    In-process LRU of serialized results, bounded by entry count, total bytes
+    and TTL. Entries carry namespace tags so a bump can purge just its own.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, ttl: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, blob, tags)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._data.pop(key)
+                self._bytes -= len(entry[1])
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, blob: bytes, tags: tuple = ()) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._data[key] = (time.monotonic() + self.ttl, blob, tags)
+            self._bytes += len(blob)
+            while self._data and (len(self._data) > self.max_items or self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def purge(self, tag: str) -> int:
+        with self._lock:
+            stale = [k for k, entry in self._data.items() if tag in entry[2]]
+            for k in stale:
+                self._bytes -= len(self._data.pop(k)[1])
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        return {"items": len(self._data), "bytes": self._bytes, "max_items": self.max_items, "max_bytes": self.max_bytes}
+
+
+class CacheVersion:
+    """
+    Local copies of the per-namespace Redis version counters
+    (cache_version:sql, cache_version:documents), kept current by pub/sub.
+    Until the subscriber is live (or if it drops) reads fall back to a GET;
+    async callers use aget so that GET does not block the event loop.
+    """
+    _versions: Dict[str, str] = {ns: "0" for ns in NAMESPACES}
+    _live = False
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+    enabled = os.getenv("CACHE_PUBSUB", "1") == "1"
+
+    @classmethod
+    def get(cls, namespaces: tuple) -> str:
+        """Combined version token for the namespaces an answer depends on."""
+        if cls._live:
+            return "|".join(f"{ns}={cls._versions[ns]}" for ns in namespaces)
+        try:
+            vers = redis_pool.client().mget([VERSION_KEY.format(ns) for ns in namespaces])
+        except Exception:
+            vers = [None] * len(namespaces)
+        return cls._token(namespaces, vers)
+
+    @classmethod
+    async def aget(cls, namespaces: tuple) -> str:
+        if cls._live:
+            return "|".join(f"{ns}={cls._versions[ns]}" for ns in namespaces)
+        try:
+            vers = await redis_pool.async_client().mget([VERSION_KEY.format(ns) for ns in namespaces])
+        except Exception:
+            vers = [None] * len(namespaces)
+        return cls._token(namespaces, vers)
+
+    @staticmethod
+    def _token(namespaces: tuple, vers: list) -> str:
+        return "|".join(f"{ns}={v.decode() if v else '0'}" for ns, v in zip(namespaces, vers))
+
+    @classmethod
+    def bump(cls, namespace: str) -> None:
+        try:
+            client = redis_pool.client()
+            ver = client.incr(VERSION_KEY.format(namespace))
+            client.publish(VERSION_CHANNEL, f"{namespace}:{ver}")
+            cls._set(namespace, str(ver))
+        except Exception:
+            # Redis may be down in dev; do not fail ingestion
+            pass
+
+    @classmethod
+    def _set(cls, namespace: str, ver: str) -> None:
+        if namespace in cls._versions and ver != cls._versions[namespace]:
+            cls._versions[namespace] = ver
+            ResultCache.local.purge(namespace)
+
+    @classmethod
+    def start(cls) -> None:
+        if not cls.enabled:
+            return
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls._listen, name="cache-version-sub", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _listen(cls) -> None:
+        while True:
+            pubsub = None
+            try:
+                client = redis_pool.client()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(VERSION_CHANNEL)
+                # Subscribe before reading so no bump between the two is lost
+                vers = client.mget([VERSION_KEY.format(ns) for ns in NAMESPACES])
+                for ns, v in zip(NAMESPACES, vers):
+                    cls._set(ns, v.decode() if v else "0")
+                cls._live = True
+                while True:
+                    msg = pubsub.get_message(timeout=0.25)
+                    if msg and msg.get("type") == "message":
+                        ns, _, ver = msg["data"].decode().partition(":")
+                        cls._set(ns, ver)
+            except Exception as e:
+                if cls._live:
+                    logger.warning(f"[result_cache] version subscriber dropped: {e}")
+                cls._live = False
+                time.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+class ResultCache:
+    """
+    Two-tier query result cache: in-process LRU (tier 1) in front of Redis
+    (tier 2). Keys embed the cache version, so a bump makes old entries
+    unreachable everywhere; the local tier also purges entries tagged with
+    the bumped namespace.
+    """
+    ttl = int(os.getenv("REDIS_TTL", "300"))
+    local = LocalLRU(
+        max_items=int(os.getenv("RESULT_CACHE_MAX_ITEMS", "10000")),
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024,
+        ttl=ttl,
+    )
+    counters: Dict[str, int] = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @classmethod
+    def get(cls, key: str, tags: tuple = ()) -> Dict[str, Any] | None:
+        blob = cls._get_local(key)
+        if blob is not None:
+            return cls._decode(blob, "memory")
+        try:
+            blob = redis_pool.client().get(key)
+        except Exception:
+            blob = None
+        return cls._from_redis(key, blob, tags)
+
+    @classmethod
+    async def aget(cls, key: str, tags: tuple = ()) -> Dict[str, Any] | None:
+        blob = cls._get_local(key)
+        if blob is not None:
+            return cls._decode(blob, "memory")
+        try:
+            blob = await redis_pool.async_client().get(key)
+        except Exception:
+            blob = None
+        return cls._from_redis(key, blob, tags)
+
+    @classmethod
+    def get_many(cls, entries: List[Tuple[str, tuple]]) -> Dict[str, Dict[str, Any]]:
+        """Batch lookup of (key, tags) pairs: local tier first, then one MGET for the rest."""
+        found, pending = cls._get_many_local(entries)
+        if pending:
+            try:
+                blobs = redis_pool.client().mget([k for k, _ in pending])
+            except Exception:
+                blobs = [None] * len(pending)
+            found.update(cls._many_from_redis(pending, blobs))
+        return found
+
+    @classmethod
+    async def aget_many(cls, entries: List[Tuple[str, tuple]]) -> Dict[str, Dict[str, Any]]:
+        found, pending = cls._get_many_local(entries)
+        if pending:
+            try:
+                blobs = await redis_pool.async_client().mget([k for k, _ in pending])
+            except Exception:
+                blobs = [None] * len(pending)
+            found.update(cls._many_from_redis(pending, blobs))
+        return found
+
+    @classmethod
+    def put_many(cls, entries: List[Tuple[str, Dict[str, Any], tuple]]) -> None:
+        blobs = [(key, cls._encode(key, out, tags)) for key, out, tags in entries]
+        try:
+            pipe = redis_pool.client().pipeline(transaction=False)
+            for key, blob in blobs:
+                if blob is not None:
+                    pipe.setex(key, cls.ttl, blob)
+            pipe.execute()
+        except Exception:
+            pass
+
+    @classmethod
+    async def aput_many(cls, entries: List[Tuple[str, Dict[str, Any], tuple]]) -> None:
+        blobs = [(key, cls._encode(key, out, tags)) for key, out, tags in entries]
+        try:
+            pipe = redis_pool.async_client().pipeline(transaction=False)
+            for key, blob in blobs:
+                if blob is not None:
+                    pipe.setex(key, cls.ttl, blob)
+            await pipe.execute()
+        except Exception:
+            pass
+
+    @classmethod
+    def put(cls, key: str, out: Dict[str, Any], tags: tuple = ()) -> None:
+        blob = cls._encode(key, out, tags)
+        if blob is None:
+            return
+        try:
+            redis_pool.client().setex(key, cls.ttl, blob)
+        except Exception:
+            pass
+
+    @classmethod
+    async def aput(cls, key: str, out: Dict[str, Any], tags: tuple = ()) -> None:
+        blob = cls._encode(key, out, tags)
+        if blob is None:
+            return
+        try:
+            await redis_pool.async_client().setex(key, cls.ttl, blob)
+        except Exception:
+            pass
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        total = sum(cls.counters.values())
+        return {
+            **cls.counters,
+            "memory_hit_rate": round(cls.counters["memory_hits"] / total, 3) if total else 0.0,
+            "redis_hit_rate": round(cls.counters["redis_hits"] / total, 3) if total else 0.0,
+            "versions": dict(CacheVersion._versions),
+            "version_live": CacheVersion._live,
+            "local": cls.local.stats(),
+        }
+
+    @classmethod
+    def _get_local(cls, key: str) -> bytes | None:
+        blob = cls.local.get(key)
+        if blob is not None:
+            cls.counters["memory_hits"] += 1
+        return blob
+
+    @classmethod
+    def _get_many_local(cls, entries: List[Tuple[str, tuple]]) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[str, tuple]]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        pending: List[Tuple[str, tuple]] = []
+        for key, tags in entries:
+            blob = cls._get_local(key)
+            if blob is not None:
+                found[key] = cls._decode(blob, "memory")
+            else:
+                pending.append((key, tags))
+        return found, pending
+
+    @classmethod
+    def _many_from_redis(cls, pending: List[Tuple[str, tuple]], blobs: List[bytes | None]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        for (key, tags), blob in zip(pending, blobs):
+            out = cls._from_redis(key, blob, tags)
+            if out is not None:
+                found[key] = out
+        return found
+
+    @classmethod
+    def _from_redis(cls, key: str, blob: bytes | None, tags: tuple) -> Dict[str, Any] | None:
+        if not blob:
+            cls.counters["misses"] += 1
+            return None
+        cls.counters["redis_hits"] += 1
+        cls.local.set(key, blob, tags)
+        return cls._decode(blob, "redis")
+
+    @classmethod
+    def _encode(cls, key: str, out: Dict[str, Any], tags: tuple) -> bytes | None:
+        try:
+            blob = dumps(out)
+        except Exception:
+            return None
+        cls.local.set(key, blob, tags)
+        return blob
+
+    @staticmethod
+    def _decode(blob: bytes, tier: str) -> Dict[str, Any]:
+        # Decoding per hit hands every caller its own copy to annotate
+        try:
+            out = orjson.loads(blob)
+        except Exception:
+            out = {"query_type": "cached", "results": {}, "performance_metrics": {}}
+        out.setdefault("performance_metrics", {})
+        out["performance_metrics"]["cache_hit"] = True
+        out["performance_metrics"]["cache_tier"] = tier
+        return out
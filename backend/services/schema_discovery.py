@@ -1,18 +1,75 @@
-from typing import Dict, Any, List, Set
+import hashlib
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+from time import perf_counter
+from typing import Dict, Any, List, Set, Tuple
 from sqlalchemy import create_engine, inspect, text
+from logger import logger
+from services.schema_index import SchemaIndex
 import re
 
 
+SAMPLE_ROWS = int(os.getenv("SCHEMA_SAMPLE_ROWS", "5"))
+SAMPLE_WORKERS = int(os.getenv("SCHEMA_SAMPLE_WORKERS", "4"))
+SAMPLE_BUDGET_MS = int(os.getenv("SCHEMA_SAMPLE_BUDGET_MS", "2000"))  # per table; slower tables are skipped
+SAMPLE_LARGE_ROWS = int(os.getenv("SCHEMA_SAMPLE_LARGE_ROWS", "100000"))  # TABLESAMPLE above this estimate
+SAMPLE_TARGET_ROWS = 1000  # rows TABLESAMPLE SYSTEM should touch on a large table
+
+
+def _ms(t0: float) -> float:
+    return round((perf_counter() - t0) * 1000, 1)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Per-table catalog definition (columns, constraints, indexes) in one round trip;
+# hashed per table to detect DDL changes without reflecting anything.
+_PG_FINGERPRINT_SQL = """
+SELECT c.table_name AS tbl, 'c' AS kind,
+       c.column_name || ':' || c.data_type || ':' || c.is_nullable || ':' || coalesce(c.column_default, '') AS def
+FROM information_schema.columns c
+JOIN information_schema.tables t ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+WHERE c.table_schema = current_schema() AND t.table_type = 'BASE TABLE'
+UNION ALL
+SELECT cl.relname, 'k', con.conname || ':' || pg_get_constraintdef(con.oid)
+FROM pg_constraint con
+JOIN pg_class cl ON cl.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = cl.relnamespace
+WHERE n.nspname = current_schema()
+UNION ALL
+SELECT tablename, 'i', indexdef FROM pg_indexes WHERE schemaname = current_schema()
+ORDER BY 1, 2, 3
+"""
+
+
 class SchemaCache:
     _schema: dict | None = None
+    _version = 0  # bumped on every set; derived caches (plans) key on it
+    _source: str | None = None  # connection string the schema was discovered from
     
     @classmethod
     def get(cls):
         return cls._schema
     
     @classmethod
-    def set(cls, s: dict):
+    def set(cls, s: dict, source: str | None = None):
+        SchemaIndex.of(s)  # compile lookups now, not on the first query
         cls._schema = s
+        cls._version += 1
+        if source:
+            cls._source = source
+    
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @classmethod
+    def source(cls) -> str | None:
+        return cls._source
 
 
 class SchemaDiscovery:
@@ -23,51 +80,216 @@ class SchemaDiscovery:
     
     def analyze_database(self, connection_string: str) -> dict:
         """
-        Analyze database and return schema with semantic tags
+        Analyze database and return schema with semantic tags.
+        Reflection runs on one connection, then every table is sampled in
+        parallel over the same engine; the engine is disposed afterwards.
+        Per-phase timings are returned under "timings_ms", tables whose sample
+        failed or ran over budget under "samples_skipped".
         """
+        t0 = perf_counter()
+        timings: Dict[str, float] = {}
         eng = create_engine(connection_string, future=True)
-        insp = inspect(eng)
+        try:
+            with eng.connect() as conn:
+                t = perf_counter()
+                insp = inspect(conn)
+                schema = self._reflect(insp)
+                timings["reflect"] = _ms(t)
+
+                t = perf_counter()
+                schema["fingerprints"] = self._fingerprints(conn, insp, schema)
+                estimates = self._row_estimates(conn)
+                timings["fingerprint"] = _ms(t)
+
+            # Get sample data for inference
+            t = perf_counter()
+            schema["samples"], schema["samples_skipped"] = self._sample(
+                eng, [tbl["name"] for tbl in schema["tables"]], estimates
+            )
+            timings["sample"] = _ms(t)
+        finally:
+            eng.dispose()
+
+        # ADD SEMANTIC TAGGING (KEY ENHANCEMENT)
+        t = perf_counter()
+        schema = self._add_semantic_tags(schema)
+
+        # Build vocabulary for autocomplete
+        schema["alias_vocab"] = self._build_vocabulary(schema)
+        timings["tag"] = _ms(t)
+
+        timings["total"] = _ms(t0)
+        schema["timings_ms"] = timings
+        logger.info(f"[schema_discovery] tables={len(schema['tables'])} timings_ms={timings}")
+        return schema
+
+    def refresh(self, connection_string: str, schema: dict) -> Tuple[dict, bool]:
+        """
+        Incremental re-discovery: fingerprint every table and re-reflect, re-tag
+        and re-sample only the ones whose definition changed (or that appeared),
+        dropping the ones that disappeared. Returns (schema, changed); the input
+        schema is never mutated, and is returned as is when nothing changed.
+        """
+        t0 = perf_counter()
+        old_fps = schema.get("fingerprints") or {}
+        eng = create_engine(connection_string, future=True)
+        try:
+            with eng.connect() as conn:
+                insp = inspect(conn)
+                fps = self._fingerprints(conn, insp)
+                changed = sorted(t for t in fps if old_fps.get(t) != fps[t])
+                dropped = set(old_fps) - set(fps)
+                if not changed and not dropped:
+                    return schema, False
+                fresh = self._reflect(insp, changed) if changed else {"tables": [], "relationships": []}
+                estimates = self._row_estimates(conn)
+            samples, skipped = self._sample(eng, changed, estimates)
+        finally:
+            eng.dispose()
+
+        self._add_semantic_tags(fresh)
+        out = self._merge_refresh(schema, fresh, samples, skipped, set(changed) | dropped, fps)
+        out["timings_ms"] = {"refresh": _ms(t0)}
+        logger.info(f"[schema_discovery] refresh changed={changed} dropped={sorted(dropped)} timings_ms={out['timings_ms']}")
+        return out, True
+
+    def _merge_refresh(self, schema: dict, fresh: dict, samples: Dict[str, List[dict]], skipped: List[dict],
+                       stale: Set[str], fps: Dict[str, str]) -> dict:
+        """
+        New schema dict from ``schema`` with the ``stale`` (changed or dropped)
+        tables' entries replaced by the freshly reflected, tagged and sampled ones.
+        """
+        tables = [t for t in schema.get("tables", []) if t["name"] not in stale] + fresh["tables"]
+        out = {
+            **schema,
+            "tables": sorted(tables, key=lambda t: t["name"]),
+            "relationships": [r for r in schema.get("relationships", []) if r["from_table"] not in stale]
+                             + fresh["relationships"],
+            "samples": {**{k: v for k, v in schema.get("samples", {}).items() if k not in stale}, **samples},
+            "samples_skipped": [s for s in schema.get("samples_skipped", []) if s["table"] not in stale] + skipped,
+            "fingerprints": fps,
+        }
+        out["alias_vocab"] = self._build_vocabulary(out)
+        return out
+
+    def _fingerprints(self, conn, insp, reflected: dict | None = None) -> Dict[str, str]:
+        """
+        Hash of each table's catalog definition. Postgres: one query over
+        information_schema/pg_catalog. Other dialects: hash of the reflected
+        table (``reflected`` if the caller already has it).
+        """
+        per_table: Dict[str, List[str]] = defaultdict(list)
+        if conn.dialect.name == "postgresql":
+            for tbl, kind, definition in conn.execute(text(_PG_FINGERPRINT_SQL)):
+                per_table[tbl].append(f"{kind}|{definition}")
+        else:
+            reflected = reflected or self._reflect(insp)
+            for t in reflected["tables"]:
+                per_table[t["name"]].append(repr(t))
+            for r in reflected["relationships"]:
+                per_table[r["from_table"]].append(repr(r))
+        return {t: hashlib.sha1("\n".join(rows).encode()).hexdigest() for t, rows in per_table.items()}
+
+    def _row_estimates(self, conn) -> Dict[str, float]:
+        """Planner row estimates (Postgres pg_class.reltuples); empty elsewhere."""
+        if conn.dialect.name != "postgresql":
+            return {}
+        rows = conn.execute(text(
+            "SELECT c.relname, c.reltuples FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')"
+        ))
+        # reltuples is -1 for tables never analyzed
+        return {name: est for name, est in rows if est and est > 0}
+
+    def _sample(self, eng, tables: List[str], estimates: Dict[str, float]) -> Tuple[Dict[str, List[dict]], List[dict]]:
+        """
+        Sample rows from every table over a bounded pool, one pooled connection
+        per worker. Returns (samples, skipped); a table is skipped when its
+        query fails or runs past SCHEMA_SAMPLE_BUDGET_MS, so one slow table
+        cannot stall discovery.
+        """
+        samples: Dict[str, List[dict]] = {}
+        skipped: List[dict] = []
+        if not tables:
+            return samples, skipped
+        workers = max(1, min(SAMPLE_WORKERS, len(tables)))
+        # Server-side budget on Postgres; this bounds everything else
+        deadline = SAMPLE_BUDGET_MS / 1000 * math.ceil(len(tables) / workers) + 5
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="schema-sample")
+        futs = {pool.submit(self._sample_table, eng, tbl, estimates.get(tbl, 0)): tbl for tbl in tables}
+        try:
+            for fut in as_completed(futs, timeout=deadline):
+                try:
+                    samples[futs[fut]] = fut.result()
+                except Exception as e:
+                    skipped.append({"table": futs[fut], "reason": str(e).splitlines()[0][:200]})
+        except FutureTimeout:
+            skipped += [{"table": tbl, "reason": "timeout"} for fut, tbl in futs.items() if not fut.done()]
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if skipped:
+            logger.warning(f"[schema_discovery] skipped sampling {len(skipped)} table(s): {[s['table'] for s in skipped]}")
+        return samples, skipped
+
+    def _sample_table(self, eng, tbl: str, estimate: float) -> List[dict]:
+        with eng.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                # Scoped to this transaction, which ends when the connection returns to the pool
+                conn.execute(text(f"SET LOCAL statement_timeout = {SAMPLE_BUDGET_MS}"))
+                if estimate >= SAMPLE_LARGE_ROWS:
+                    # Block-level sampling: reads ~SAMPLE_TARGET_ROWS rows whatever the table size,
+                    # spread over the table instead of its first pages
+                    pct = max(SAMPLE_TARGET_ROWS * 100.0 / estimate, 0.0001)
+                    rows = conn.execute(text(
+                        f"SELECT * FROM {_quote(tbl)} TABLESAMPLE SYSTEM ({pct:.4f}) LIMIT {SAMPLE_ROWS}"
+                    )).mappings().all()
+                    if rows:
+                        return [dict(r) for r in rows]
+            rows = conn.execute(text(f"SELECT * FROM {_quote(tbl)} LIMIT {SAMPLE_ROWS}")).mappings().all()
+            return [dict(r) for r in rows]
+
+    def _reflect(self, insp, names: List[str] | None = None) -> Dict[str, Any]:
+        """
+        Tables, keys, indexes and foreign keys (all tables, or just ``names``).
+        Uses the inspector's multi-table calls (SQLAlchemy 2.x: one catalog
+        query per kind for all tables) and falls back to per-table calls on
+        older versions.
+        """
         schema: Dict[str, Any] = {"tables": [], "relationships": []}
-        
+        if hasattr(insp, "get_multi_columns"):
+            # Keys are (schema, table); schema is None for the default schema
+            cols = {k[1]: v for k, v in insp.get_multi_columns(filter_names=names).items()}
+            fks = {k[1]: v for k, v in insp.get_multi_foreign_keys(filter_names=names).items()}
+            pks = {k[1]: v for k, v in insp.get_multi_pk_constraint(filter_names=names).items()}
+            idx = {k[1]: v for k, v in insp.get_multi_indexes(filter_names=names).items()}
+            names = sorted(cols)
+        else:
+            names = names if names is not None else insp.get_table_names()
+            cols = {t: insp.get_columns(t) for t in names}
+            fks = {t: insp.get_foreign_keys(t) for t in names}
+            pks = {t: insp.get_pk_constraint(t) for t in names}
+            idx = {t: insp.get_indexes(t) for t in names}
+
         # Get table metadata
-        for tbl in insp.get_table_names():
-            cols = insp.get_columns(tbl)
-            fks = insp.get_foreign_keys(tbl)
-            pks = insp.get_pk_constraint(tbl)
-            idx = insp.get_indexes(tbl)
-            
+        for tbl in names:
             table_info = {
                 "name": tbl,
-                "columns": [{"name": c["name"], "type": str(c["type"])} for c in cols],
-                "primary_key": pks.get("constrained_columns", []),
-                "indexes": [{"name": i["name"], "columns": i["column_names"]} for i in idx],
+                "columns": [{"name": c["name"], "type": str(c["type"])} for c in cols.get(tbl, [])],
+                "primary_key": (pks.get(tbl) or {}).get("constrained_columns", []),
+                "indexes": [{"name": i["name"], "columns": i["column_names"]} for i in idx.get(tbl, [])],
             }
-            
+
             schema["tables"].append(table_info)
-            
+
             # Add foreign key relationships
-            for fk in fks:
+            for fk in fks.get(tbl, []):
                 schema["relationships"].append({
                     "from_table": tbl,
                     "from_columns": fk.get("constrained_columns", []),
                     "to_table": fk.get("referred_table"),
                     "to_columns": fk.get("referred_columns", []),
                 })
-        
-        # Get sample data for inference
-        samples = {}
-        for t in [t["name"] for t in schema["tables"][:10]]:  # Limit to prevent slowdown
-            with eng.connect() as conn:
-                rows = conn.execute(text(f'SELECT * FROM "{t}" LIMIT 5')).mappings().all()
-                samples[t] = [dict(r) for r in rows]
-        schema["samples"] = samples
-        
-        # ADD SEMANTIC TAGGING (KEY ENHANCEMENT)
-        schema = self._add_semantic_tags(schema)
-        
-        # Build vocabulary for autocomplete
-        schema["alias_vocab"] = self._build_vocabulary(schema)
-        
         return schema
     
     def _add_semantic_tags(self, schema: dict) -> dict:
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+
+class SchemaIndex:
+    """
+    Lookup tables compiled once per schema dict, so the parser and the SQL
+    builder resolve tables, tagged columns and foreign keys with dict lookups
+    instead of scanning schema['tables'] / ['relationships'] on every query.
+    Where several entries match, the first one in schema order wins, exactly
+    like the next(...) scans this replaces.
+    """
+    max_items = 8
+
+    _cache: "OrderedDict[int, Tuple[dict, SchemaIndex]]" = OrderedDict()  # id(schema) -> (schema, index)
+    _lock = threading.Lock()
+
+    def __init__(self, schema: dict):
+        tables = schema.get('tables', [])
+        self.first_table: str | None = tables[0]['name'] if tables else None
+        self.tables: Dict[str, dict] = {}
+        self.tables_by_tag: Dict[str, str] = {}
+        self.columns_by_tag: Dict[Tuple[str, str], str] = {}
+        self.name_columns: Dict[str, str] = {}  # first column with "name" in its name
+        for t in tables:
+            self.tables.setdefault(t['name'], t)
+            self.tables_by_tag.setdefault(t.get('semantic_tag'), t['name'])
+            for c in t.get('columns', []):
+                self.columns_by_tag.setdefault((t['name'], c.get('semantic_tag')), c['name'])
+                if 'name' in c['name'].lower():
+                    self.name_columns.setdefault(t['name'], c['name'])
+
+        self.relationships: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for rel in schema.get('relationships', []):
+            if rel.get('from_columns') and rel.get('to_columns'):
+                self.relationships.setdefault(
+                    (rel['from_table'], rel['to_table']), (rel['from_columns'][0], rel['to_columns'][0])
+                )
+
+    @classmethod
+    def of(cls, schema: dict) -> "SchemaIndex":
+        """
+        Index for this schema dict, built on first use. Schemas are replaced,
+        never edited in place, once they reach SchemaCache, so identity is
+        the cache key (the dict is held to keep its id from being reused).
+        """
+        key = id(schema)
+        with cls._lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is schema:
+                cls._cache.move_to_end(key)
+                return entry[1]
+        index = cls(schema)
+        with cls._lock:
+            cls._cache[key] = (schema, index)
+            while len(cls._cache) > cls.max_items:
+                cls._cache.popitem(last=False)
+        return index
+
+    def table(self, name: str) -> dict | None:
+        return self.tables.get(name)
+
+    def table_by_tag(self, tag: str) -> str | None:
+        return self.tables_by_tag.get(tag)
+
+    def column(self, table: str, tag: str) -> str | None:
+        """First column of ``table`` with this semantic tag."""
+        return self.columns_by_tag.get((table, tag))
+
+    def name_column(self, table: str) -> str | None:
+        return self.name_columns.get(table)
+
+    def fk(self, from_table: str, to_table: str) -> Tuple[str, str] | Tuple[None, None]:
+        """(from column, to column) of the first foreign key between the tables."""
+        return self.relationships.get((from_table, to_table), (None, None))
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from logger import logger
+from models import redis_pool
+from services.result_cache import CacheVersion, SQL
+from services.schema_discovery import SchemaCache, SchemaDiscovery
+from services.schema_store import SchemaStore, redact_dsn
+
+REFRESH_LOCK_KEY = "schema:refresh_lock"
+
+
+class SchemaRefresher:
+    """
+    Background thread picking up DDL changes: every SCHEMA_REFRESH_SECONDS it
+    fingerprints the catalog and, only if some table changed, swaps in the
+    incrementally refreshed schema and bumps the sql cache version. Every
+    worker runs the thread, but only the one holding schema:refresh_lock for
+    the interval refreshes; the rest pick the result up through SchemaStore.
+    """
+    interval = float(os.getenv("SCHEMA_REFRESH_SECONDS", "300"))  # 0 disables
+
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+    _stop = threading.Event()
+    discovery = SchemaDiscovery()
+
+    @classmethod
+    def start(cls) -> None:
+        if cls.interval <= 0:
+            return
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._stop.clear()
+                cls._thread = threading.Thread(target=cls._loop, name="schema-refresh", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        cls._stop.set()
+
+    @classmethod
+    def _loop(cls) -> None:
+        while not cls._stop.wait(cls.interval):
+            try:
+                cls.refresh_once()
+            except Exception as e:
+                logger.error(f"[schema_refresh] failed: {e}")
+
+    @classmethod
+    def refresh_once(cls) -> bool:
+        """Returns True if the schema changed."""
+        schema = SchemaCache.get()
+        source = SchemaCache.source() or os.getenv("DATABASE_URL")
+        if not schema or not source:
+            # Nothing discovered yet; the first query or ingest does a full pass
+            return False
+        if SchemaStore.source() and redact_dsn(source) != SchemaStore.source():
+            # Schema came from a database this worker holds no credentials for;
+            # a worker that does will refresh it
+            return False
+        if not cls._claim():
+            return False
+        new, changed = cls.discovery.refresh(source, schema)
+        if not changed:
+            return False
+        # Only swap if no ingest replaced the schema meanwhile
+        if SchemaCache.get() is schema:
+            SchemaStore.publish(new, source)
+            CacheVersion.bump(SQL)
+        return True
+
+    @classmethod
+    def _claim(cls) -> bool:
+        """Take this interval's refresh; the lock expires rather than being released, so peers skip it."""
+        try:
+            return bool(redis_pool.client().set(REFRESH_LOCK_KEY, str(os.getpid()), nx=True,
+                                                ex=max(1, int(cls.interval))))
+        except Exception:
+            # Redis down: no peers can hear a publish anyway, refresh locally
+            return True
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+from urllib.parse import urlsplit, urlunsplit
+
+import orjson
+
+from logger import logger
+from models import redis_pool
+from services.serialization import json_default
+from services.schema_discovery import SchemaCache
+
+SCHEMA_KEY = "schema:current"
+SCHEMA_VERSION_KEY = "schema:version"
+SCHEMA_STORED_VERSION_KEY = "schema:current_version"  # version of the blob in schema:current
+SCHEMA_LOCK_KEY = "schema:discover_lock"
+SCHEMA_CHANNEL = "schema_updates"
+FORMAT_VERSION = 1
+
+SCHEMA_FILE = Path(os.getenv("SCHEMA_FILE", str(Path(__file__).resolve().parent.parent / "schema_store" / "schema.json")))
+DISCOVER_LOCK_SECONDS = int(os.getenv("SCHEMA_DISCOVER_LOCK_SECONDS", "120"))
+
+# Store and announce a blob only if its version is newer than the stored one,
+# so concurrent publishers cannot leave an older schema behind a newer notice
+_PUBLISH_IF_NEWER = """
+if tonumber(ARGV[1]) <= tonumber(redis.call('GET', KEYS[2]) or '0') then return 0 end
+redis.call('SET', KEYS[1], ARGV[2])
+redis.call('SET', KEYS[2], ARGV[1])
+redis.call('PUBLISH', ARGV[3], ARGV[1])
+return 1
+"""
+
+
+def redact_dsn(dsn: str | None) -> str | None:
+    """
+    The connection string without password or query parameters: names the
+    database in the shared blob without handing its credentials to every
+    Redis client.
+    """
+    if not dsn:
+        return None
+    parts = urlsplit(dsn)
+    user, _, hostport = parts.netloc.rpartition("@")
+    netloc = f"{user.partition(':')[0]}@{hostport}" if user else hostport
+    return urlunsplit((parts.scheme, netloc, parts.path, "", ""))
+
+
+def _jsonable(obj: Any):
+    """
+    Sample rows carry raw driver values (bytea, interval, ranges, ...); the
+    ones json_default cannot encode are shared as their str().
+    """
+    try:
+        return json_default(obj)
+    except TypeError:
+        return str(obj)
+
+
+class SchemaStore:
+    """
+    Shares the discovered schema, and which database it was discovered from,
+    across workers and restarts. A published schema gets a version from INCR
+    schema:version and is written to Redis (schema:current) and to SCHEMA_FILE
+    (tmp + os.replace), then announced on the schema_updates channel; every
+    worker's subscriber pulls the new blob into its SchemaCache. At boot a worker loads Redis, then the file, and only
+    runs discovery if neither has a schema (one worker at a time, by lock).
+    The blob names its database by redact_dsn(); each worker maps that back
+    to a connection string it already holds (its own or DATABASE_URL).
+    """
+    _version = 0  # version of the schema this worker holds
+    _source: str | None = None  # redacted source of that schema
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+    enabled = os.getenv("SCHEMA_PUBSUB", "1") == "1"
+
+    @classmethod
+    def publish(cls, schema: dict, source: str | None = None) -> int:
+        """
+        Install the schema locally and share it; returns the version this
+        worker now holds (0 if Redis is down). If a concurrent publisher
+        stored a newer version first, that schema is loaded instead.
+        """
+        version = 0
+        try:
+            version = int(redis_pool.client().incr(SCHEMA_VERSION_KEY))
+        except Exception:
+            pass
+        # Serialize first: if this raised after the swap, the worker would hold
+        # a schema nobody else could load
+        source_id = redact_dsn(source or os.getenv("DATABASE_URL"))
+        doc = {"format_version": FORMAT_VERSION, "version": version, "schema": schema, "source": source_id}
+        blob = orjson.dumps(doc, default=_jsonable, option=orjson.OPT_NON_STR_KEYS)
+        try:
+            stored = redis_pool.client().eval(_PUBLISH_IF_NEWER, 2, SCHEMA_KEY, SCHEMA_STORED_VERSION_KEY,
+                                              version, blob, SCHEMA_CHANNEL)
+        except Exception:
+            # Redis may be down in dev; the file still carries the schema across restarts
+            stored = None
+        if stored == 0:
+            logger.info(f"[schema_store] version={version} superseded before it was stored; loading the newer one")
+            cls._load_redis()
+            return cls._version
+        with cls._lock:
+            SchemaCache.set(schema, source)
+            cls._version = version
+            cls._source = source_id
+        cls._write_file(blob)
+        return version
+
+    @classmethod
+    def load(cls) -> bool:
+        """Boot-time load: Redis first, then the local file."""
+        return cls._load_redis() or cls._load_file()
+
+    @classmethod
+    def load_or_discover(cls, discover: Callable[[], dict], source: str | None = None) -> dict:
+        """Load a shared schema, or discover and publish one; concurrent boots wait for one discoverer."""
+        if cls.load():
+            return SchemaCache.get()
+        try:
+            leader = redis_pool.client().set(SCHEMA_LOCK_KEY, str(os.getpid()), nx=True, ex=DISCOVER_LOCK_SECONDS)
+        except Exception:
+            leader = True
+        if not leader:
+            deadline = time.monotonic() + DISCOVER_LOCK_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.5)
+                if cls._load_redis():
+                    return SchemaCache.get()
+            logger.warning("[schema_store] timed out waiting for another worker's discovery")
+        try:
+            schema = discover()
+            cls.publish(schema, source)
+            return schema
+        finally:
+            if leader:
+                try:
+                    redis_pool.client().delete(SCHEMA_LOCK_KEY)
+                except Exception:
+                    pass
+
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @classmethod
+    def source(cls) -> str | None:
+        """Redacted source of the schema this worker holds (None if not from the store)."""
+        return cls._source
+
+    @classmethod
+    def start(cls) -> None:
+        if not cls.enabled:
+            return
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls._listen, name="schema-sub", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _listen(cls) -> None:
+        while True:
+            pubsub = None
+            try:
+                client = redis_pool.client()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(SCHEMA_CHANNEL)
+                # Subscribe before reading so no publish between the two is lost
+                cls._load_redis()
+                while True:
+                    msg = pubsub.get_message(timeout=0.25)
+                    if msg and msg.get("type") == "message" and int(msg["data"]) != cls._version:
+                        cls._load_redis()
+            except Exception as e:
+                logger.warning(f"[schema_store] subscriber dropped: {e}")
+                time.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    @classmethod
+    def _load_redis(cls) -> bool:
+        try:
+            blob = redis_pool.client().get(SCHEMA_KEY)
+        except Exception:
+            return False
+        return blob is not None and cls._install(blob, "redis")
+
+    @classmethod
+    def _load_file(cls) -> bool:
+        try:
+            blob = SCHEMA_FILE.read_bytes()
+        except OSError:
+            return False
+        return cls._install(blob, "file")
+
+    @classmethod
+    def _install(cls, blob: bytes, origin: str) -> bool:
+        try:
+            doc: Dict[str, Any] = orjson.loads(blob)
+        except orjson.JSONDecodeError:
+            logger.warning(f"[schema_store] unreadable schema from {origin}")
+            return False
+        if doc.get("format_version") != FORMAT_VERSION or not doc.get("schema"):
+            return False
+        with cls._lock:
+            if SchemaCache.get() is not None and doc["version"] == cls._version:
+                return True
+            # Map the redacted source back to a connection this worker holds,
+            # so its refresher fingerprints the database the schema came from
+            source_id = redact_dsn(doc.get("source"))
+            source = next((dsn for dsn in (SchemaCache.source(), os.getenv("DATABASE_URL"))
+                           if dsn and redact_dsn(dsn) == source_id), None)
+            SchemaCache.set(doc["schema"], source)
+            cls._version = doc["version"]
+            cls._source = source_id
+        logger.info(f"[schema_store] loaded schema version={doc['version']} from {origin}")
+        return True
+
+    @staticmethod
+    def _write_file(blob: bytes) -> None:
+        try:
+            SCHEMA_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = SCHEMA_FILE.with_suffix(".tmp")
+            with open(tmp, "wb") as fh:
+                fh.write(blob)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, SCHEMA_FILE)
+        except OSError as e:
+            logger.warning(f"[schema_store] could not write {SCHEMA_FILE}: {e}")
@@ -0,0 +1,90 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple
+
+from services.embeddings import EmbeddingCache
+from services.vector_store import VectorStore
+
+
+class SearchBatcher:
+    """
+    Coalesces concurrent document searches. Requests arriving within
+    SEARCH_BATCH_WINDOW_MS of the first one (up to SEARCH_BATCH_MAX) are
+    embedded and searched as one matrix, then fanned back to their callers.
+    A window of 0 disables batching.
+    """
+    window_ms = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "3"))
+    max_batch = int(os.getenv("SEARCH_BATCH_MAX", "32"))
+
+    _queue: "queue.Queue[Tuple[str, int, Future]]" = queue.Queue()
+    _thread: threading.Thread | None = None
+    _lock = threading.Lock()
+    counters: Dict[str, int] = {"batches": 0, "queries": 0, "max_seen": 0}
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return cls.window_ms > 0 and cls.max_batch > 1
+
+    @classmethod
+    def search(cls, query: str, top_k: int) -> Tuple[List[Dict[str, Any]], str]:
+        """Returns (hits, embedding cache tier) for one query."""
+        if not cls.enabled():
+            vecs, tiers = EmbeddingCache.encode_queries([query])
+            return VectorStore.search(vecs, top_k)[0], tiers[0]
+        cls._ensure_worker()
+        fut: Future = Future()
+        cls._queue.put((query, top_k, fut))
+        return fut.result()
+
+    @classmethod
+    def search_many(cls, queries: List[str], top_k: int) -> List[Tuple[List[Dict[str, Any]], str]]:
+        """Caller-assembled batch (e.g. /api/query/batch): one embedding matrix, one index search."""
+        if not queries:
+            return []
+        vecs, tiers = EmbeddingCache.encode_queries(queries)
+        hits = VectorStore.search(vecs, top_k)
+        cls.counters["batches"] += 1
+        cls.counters["queries"] += len(queries)
+        cls.counters["max_seen"] = max(cls.counters["max_seen"], len(queries))
+        return list(zip(hits, tiers))
+
+    @classmethod
+    def _ensure_worker(cls) -> None:
+        if cls._thread is None or not cls._thread.is_alive():
+            with cls._lock:
+                if cls._thread is None or not cls._thread.is_alive():
+                    cls._thread = threading.Thread(target=cls._run, name="search-batcher", daemon=True)
+                    cls._thread.start()
+
+    @classmethod
+    def _run(cls) -> None:
+        while True:
+            batch = [cls._queue.get()]
+            deadline = time.monotonic() + cls.window_ms / 1000.0
+            while len(batch) < cls.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(cls._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            cls._execute(batch)
+
+    @classmethod
+    def _execute(cls, batch: List[Tuple[str, int, Future]]) -> None:
+        try:
+            vecs, tiers = EmbeddingCache.encode_queries([q for q, _, _ in batch])
+            hits = VectorStore.search(vecs, max(k for _, k, _ in batch))
+            for (_, k, fut), h, tier in zip(batch, hits, tiers):
+                fut.set_result((h[:k], tier))
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        cls.counters["batches"] += 1
+        cls.counters["queries"] += len(batch)
+        cls.counters["max_seen"] = max(cls.counters["max_seen"], len(batch))
@@ -0,0 +1,47 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network, IPv6Address, IPv6Interface, IPv6Network
+from pathlib import PurePath
+from typing import Any
+from uuid import UUID
+
+import orjson
+
+# Rendered as str(), as FastAPI's jsonable_encoder does
+_AS_STR = (UUID, PurePath, IPv4Address, IPv4Interface, IPv4Network, IPv6Address, IPv6Interface, IPv6Network)
+
+
+def json_default(obj: Any):
+    """
+    orjson fallback for what database rows carry beyond its native types,
+    encoded the way jsonable_encoder did before responses moved to orjson.
+    """
+    if isinstance(obj, Decimal):
+        # NUMERIC: integral values as int, the rest as float
+        exponent = obj.as_tuple().exponent
+        return int(obj) if isinstance(exponent, int) and exponent >= 0 else float(obj)
+    if isinstance(obj, (date, datetime, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        # interval columns
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        # bytea columns: text when it decodes, base64 otherwise
+        raw = bytes(obj)
+        try:
+            return raw.decode()
+        except UnicodeDecodeError:
+            return base64.b64encode(raw).decode("ascii")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, _AS_STR):
+        return str(obj)
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=json_default)
@@ -1,5 +1,7 @@
 from typing import Dict, Any, List, Tuple
 
+from services.schema_index import SchemaIndex
+
 
 class SQLBuilder:
     
@@ -23,34 +25,26 @@ class SQLBuilder:
         """NEW: Build SQL for 'Who reports to X' queries"""
         person_name = intent['reports_to']
         entity_table = intent['target_tables'][0]
+        idx = SchemaIndex.of(schema)
         
         # Find org table
-        org_table = next((t['name'] for t in schema['tables'] 
-                        if t.get('semantic_tag') == 'organizational_unit'), None)
+        org_table = idx.table_by_tag('organizational_unit')
         
         if not org_table:
             # Fallback: return all employees
             return f'SELECT * FROM "{entity_table}"', {}
         
         # Find FK relationship
-        fk_from, fk_to = None, None
-        for rel in schema.get('relationships', []):
-            if rel['from_table'] == entity_table and rel['to_table'] == org_table:
-                fk_from, fk_to = rel['from_columns'][0], rel['to_columns'][0]
-                break
+        fk_from, fk_to = idx.fk(entity_table, org_table)
         
         if not fk_from:
             return f'SELECT * FROM "{entity_table}"', {}
         
         # Find name column in employees table
-        entity_tbl = next((t for t in schema['tables'] if t['name'] == entity_table), None)
-        name_col = next((c['name'] for c in entity_tbl['columns'] 
-                       if 'name' in c['name'].lower()), None) if entity_tbl else None
+        name_col = idx.name_column(entity_table)
         
         # Find dept_name column in org table
-        org_tbl = next((t for t in schema['tables'] if t['name'] == org_table), None)
-        org_name_col = next((c['name'] for c in org_tbl['columns'] 
-                           if c.get('semantic_tag') == 'name'), None) if org_tbl else None
+        org_name_col = idx.column(org_table, 'name')
         
         if not all([name_col, org_name_col]):
             return f'SELECT * FROM "{entity_table}"', {}
@@ -95,24 +89,18 @@ class SQLBuilder:
         # WITH ORG GROUPING
         if intent['grouping'] == 'org':
             entity_table = intent['target_tables'][0]
-            org_table = next((t['name'] for t in schema['tables'] 
-                            if t.get('semantic_tag') == 'organizational_unit'), None)
+            idx = SchemaIndex.of(schema)
+            org_table = idx.table_by_tag('organizational_unit')
             
             if not org_table:
                 return f'SELECT {agg_expr} as average_salary FROM "{entity_table}"', {}
             
-            fk_from, fk_to = None, None
-            for rel in schema.get('relationships', []):
-                if rel['from_table'] == entity_table and rel['to_table'] == org_table:
-                    fk_from, fk_to = rel['from_columns'][0], rel['to_columns'][0]
-                    break
+            fk_from, fk_to = idx.fk(entity_table, org_table)
             
             if not fk_from:
                 return f'SELECT {agg_expr} as average_salary FROM "{entity_table}"', {}
             
-            org_tbl = next((t for t in schema['tables'] if t['name'] == org_table), None)
-            org_name_col = next((c['name'] for c in org_tbl['columns'] 
-                               if c.get('semantic_tag') == 'name'), None) if org_tbl else None
+            org_name_col = idx.column(org_table, 'name')
             
             if not org_name_col:
                 return f'SELECT {agg_expr} as average_salary FROM "{entity_table}"', {}
@@ -124,18 +112,18 @@ class SQLBuilder:
                 f'GROUP BY o."{org_name_col}" '
             )
             
+            params = {}
             if intent['having']:
-                sql += f'HAVING {agg_expr} {intent["having"]["operator"]} {intent["having"]["value"]} '
+                sql += f'HAVING {agg_expr} {intent["having"]["operator"]} :having_value '
+                params['having_value'] = intent['having']['value']
             
             sql += 'ORDER BY average_salary DESC'
-            return sql, {}
+            return sql, params
         
         # WITH LOCATION GROUPING
         elif intent['grouping'] == 'location':
             table = intent['target_tables'][0]
-            tbl_obj = next((t for t in schema['tables'] if t['name'] == table), None)
-            loc_col = next((c['name'] for c in tbl_obj['columns'] 
-                          if c.get('semantic_tag') == 'location'), None) if tbl_obj else None
+            loc_col = SchemaIndex.of(schema).column(table, 'location')
             
             if loc_col:
                 return (
@@ -152,34 +140,23 @@ class SQLBuilder:
     def _build_window_function(self, intent: Dict, schema: dict) -> Tuple[str, Dict]:
         """Top N per department using ROW_NUMBER()"""
         entity_table = intent['target_tables'][0]
-        org_table = next((t['name'] for t in schema['tables'] 
-                        if t.get('semantic_tag') == 'organizational_unit'), None)
+        idx = SchemaIndex.of(schema)
+        org_table = idx.table_by_tag('organizational_unit')
         
         if not org_table:
             return self._build_list(intent, schema)
         
-        fk_from, fk_to = None, None
-        for rel in schema.get('relationships', []):
-            if rel['from_table'] == entity_table and rel['to_table'] == org_table:
-                fk_from, fk_to = rel['from_columns'][0], rel['to_columns'][0]
-                break
+        fk_from, fk_to = idx.fk(entity_table, org_table)
         
         if not fk_from:
             return self._build_list(intent, schema)
         
-        org_tbl = next((t for t in schema['tables'] if t['name'] == org_table), None)
-        org_name_col = next((c['name'] for c in org_tbl['columns'] 
-                           if c.get('semantic_tag') == 'name'), None) if org_tbl else None
-        
-        entity_tbl = next((t for t in schema['tables'] if t['name'] == entity_table), None)
-        salary_col = next((c['name'] for c in entity_tbl['columns'] 
-                         if c.get('semantic_tag') == 'numeric_measure'), None) if entity_tbl else None
+        org_name_col = idx.column(org_table, 'name')
+        salary_col = idx.column(entity_table, 'numeric_measure')
         
         if not all([org_name_col, salary_col]):
             return self._build_list(intent, schema)
         
-        limit = intent['window_function']['limit']
-        
         sql = f'''
         WITH ranked AS (
             SELECT e.*, o."{org_name_col}" as department,
@@ -187,33 +164,27 @@ class SQLBuilder:
             FROM "{entity_table}" e
             LEFT JOIN "{org_table}" o ON e."{fk_from}" = o."{fk_to}"
         )
-        SELECT * FROM ranked WHERE rn <= {limit}
+        SELECT * FROM ranked WHERE rn <= :rn_limit
         ORDER BY department, rn
         '''
         
-        return sql.strip(), {}
+        return sql.strip(), {'rn_limit': intent['window_function']['limit']}
     
     def _build_list(self, intent: Dict, schema: dict) -> Tuple[str, Dict]:
         table = intent['target_tables'][0]
         params = {}
         
-        tbl_obj = next((t for t in schema['tables'] if t['name'] == table), None)
+        idx = SchemaIndex.of(schema)
+        tbl_obj = idx.table(table)
         
         if tbl_obj and tbl_obj.get('semantic_tag') == 'primary_entity':
-            org_table = next((t['name'] for t in schema['tables'] 
-                            if t.get('semantic_tag') == 'organizational_unit'), None)
+            org_table = idx.table_by_tag('organizational_unit')
             
             if org_table:
-                fk_from, fk_to = None, None
-                for rel in schema.get('relationships', []):
-                    if rel['from_table'] == table and rel['to_table'] == org_table:
-                        fk_from, fk_to = rel['from_columns'][0], rel['to_columns'][0]
-                        break
+                fk_from, fk_to = idx.fk(table, org_table)
                 
                 if fk_from:
-                    org_tbl = next((t for t in schema['tables'] if t['name'] == org_table), None)
-                    org_name_col = next((c['name'] for c in org_tbl['columns'] 
-                                       if c.get('semantic_tag') == 'name'), None) if org_tbl else None
+                    org_name_col = idx.column(org_table, 'name')
                     
                     if org_name_col:
                         sql = (
@@ -222,32 +193,99 @@ class SQLBuilder:
                             f'LEFT JOIN "{org_table}" o ON e."{fk_from}" = o."{fk_to}" '
                         )
                         
+                        conditions = []
                         if intent['filters']:
                             where, params = self._build_where(intent['filters'], alias='e')
-                            sql += f'WHERE {where} '
+                            conditions.append(where)
+                        
+                        keyset = self._keyset(intent, tbl_obj, alias='e')
+                        if keyset:
+                            conditions += keyset[0]
                         
-                        if intent['ordering']:
+                        if conditions:
+                            sql += f'WHERE {" AND ".join(conditions)} '
+                        
+                        if keyset:
+                            sql += f'ORDER BY {keyset[1]} '
+                        elif intent['ordering']:
                             sql += f'ORDER BY e."{intent["ordering"]["column"]}" {intent["ordering"]["direction"]} '
                         
                         if intent['limit']:
-                            sql += f'LIMIT {intent["limit"]}'
+                            sql += 'LIMIT :limit'
+                            params['limit'] = intent['limit']
                         
                         return sql, params
         
         sql = f'SELECT * FROM "{table}"'
         
+        conditions = []
         if intent['filters']:
             where, params = self._build_where(intent['filters'])
-            sql += f' WHERE {where}'
+            conditions.append(where)
         
-        if intent['ordering']:
+        keyset = self._keyset(intent, tbl_obj)
+        if keyset:
+            conditions += keyset[0]
+        
+        if conditions:
+            sql += f' WHERE {" AND ".join(conditions)}'
+        
+        if keyset:
+            sql += f' ORDER BY {keyset[1]}'
+        elif intent['ordering']:
             sql += f' ORDER BY "{intent["ordering"]["column"]}" {intent["ordering"]["direction"]}'
         
         if intent['limit']:
-            sql += f' LIMIT {intent["limit"]}'
+            sql += ' LIMIT :limit'
+            params['limit'] = intent['limit']
         
         return sql, params
     
+    def _keyset(self, intent: Dict, tbl_obj: dict | None, alias: str = '') -> Tuple[List[str], str] | None:
+        """
+        Cursor predicate and ORDER BY for keyset pagination of list results.
+        Orders by the ordering column (NULLS LAST) with the primary key as
+        tiebreaker, so a page seeks past the previous one instead of scanning
+        and discarding OFFSET rows. The cursor values are bound by the caller as
+        :after_order / :after_pk; the chosen columns are recorded on the intent
+        as keyset_columns. Shape "offset" only returns the ORDER BY, for OFFSET
+        pages of the same query. Returns None when the plan is not pageable this way.
+        """
+        shape = intent.get('keyset')
+        pk = (tbl_obj or {}).get('primary_key') or []
+        if not shape or intent['limit'] or len(pk) != 1:
+            return None
+        
+        prefix = f'{alias}.' if alias else ''
+        key = f'{prefix}"{pk[0]}"'
+        ordering = intent['ordering']
+        if not ordering:
+            order = f'{key} ASC'
+        else:
+            col = f'{prefix}"{ordering["column"]}"'
+            direction = ordering['direction']
+            order = f'{col} {direction} NULLS LAST, {key} {direction}'
+        if shape == 'offset':
+            # OFFSET pages get the same total order as keyset pages, so a client
+            # mixing the two (page 1 by keyset, page 2 by offset) sees no gaps
+            # or repeats; no keyset_columns, the caller pages with OFFSET
+            return [], order
+        
+        if not ordering:
+            intent['keyset_columns'] = [None, pk[0]]
+            after = [f'{key} > :after_pk'] if shape != 'first' else []
+            return after, order
+        
+        op = '<' if direction == 'DESC' else '>'
+        intent['keyset_columns'] = [ordering['column'], pk[0]]
+        if shape == 'after':
+            after = [f'(({col}, {key}) {op} (:after_order, :after_pk) OR {col} IS NULL)']
+        elif shape == 'after_null':
+            after = [f'{col} IS NULL AND {key} {op} :after_pk']
+        else:
+            after = []
+        return after, order
+    
     def _build_where(self, filters: List[Dict], alias: str = '') -> Tuple[str, Dict]:
         conditions = []
         params = {}
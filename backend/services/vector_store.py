@@ -0,0 +1,453 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+import faiss, numpy as np
+import orjson
+
+from logger import logger
+
+DIM = 384  # all-MiniLM-L6-v2
+FORMAT_VERSION = 1
+
+STORE_DIR = Path(os.getenv("VECTOR_STORE_DIR", str(Path(__file__).resolve().parent.parent / "vector_store")))
+KEEP_SNAPSHOTS = int(os.getenv("VECTOR_STORE_KEEP", "2"))
+
+# Index mode: flat | ivf | hnsw | auto (flat below VECTOR_ANN_THRESHOLD, VECTOR_ANN_KIND above)
+INDEX_MODE = os.getenv("VECTOR_INDEX", "auto").lower()
+ANN_KIND = os.getenv("VECTOR_ANN_KIND", "hnsw").lower()
+ANN_THRESHOLD = int(os.getenv("VECTOR_ANN_THRESHOLD", "200000"))
+IVF_NLIST = int(os.getenv("VECTOR_IVF_NLIST", "0"))  # 0 = 4 * sqrt(ntotal)
+IVF_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+HNSW_M = int(os.getenv("VECTOR_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+IVF_MIN_TRAIN = 10000  # below this an IVF index would be undertrained; stay flat
+IVF_RETRAIN_FACTOR = 4  # retrain IVF once the corpus grows this much past its training size
+COMPACT_RATIO = float(os.getenv("VECTOR_COMPACT_RATIO", "0.2"))  # drop tombstoned vectors past this share
+
+
+def _fsync_file(path: Path) -> None:
+    with open(path, "rb") as fh:
+        os.fsync(fh.fileno())
+
+
+def _fsync_dir(path: Path) -> None:
+    # Directory fsync is not supported on Windows; the rename is still atomic there
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def index_kind(index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def build_index(kind: str, vecs: np.ndarray) -> faiss.Index:
+    """Build a fresh index of ``kind`` over ``vecs`` (training it if needed)."""
+    vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(DIM, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivf":
+        nlist = IVF_NLIST or max(1, int(4 * np.sqrt(max(len(vecs), 1))))
+        nlist = min(nlist, max(1, len(vecs) // 39))  # faiss wants >= 39 training points per list
+        quantizer = faiss.IndexFlatIP(DIM)
+        index = faiss.IndexIVFFlat(quantizer, DIM, nlist, faiss.METRIC_INNER_PRODUCT)
+        rng = np.random.default_rng(0)
+        sample = vecs if len(vecs) <= 256 * nlist else vecs[rng.choice(len(vecs), 256 * nlist, replace=False)]
+        index.train(sample)
+    else:
+        index = faiss.IndexFlatIP(DIM)
+    if len(vecs):
+        index.add(vecs)
+    return index
+
+
+def apply_search_params(index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH) -> None:
+    kind = index_kind(index)
+    if kind == "ivf":
+        index.nprobe = nprobe
+    elif kind == "hnsw":
+        index.hnsw.efSearch = ef_search
+
+
+class VectorStore:
+    """
+    Process-wide FAISS index plus chunk metadata.
+
+    On-disk layout (format_version 1):
+        STORE_DIR/CURRENT              {"format_version": 1, "snapshot": "snap-000007"}
+        STORE_DIR/snap-000007/index.faiss
+        STORE_DIR/snap-000007/meta.json
+        STORE_DIR/snap-000007/manifest.json
+
+    Snapshots are written to a ``.tmp`` directory, fsynced and renamed, then
+    CURRENT is swapped with os.replace, so a crash mid-write leaves the
+    previous snapshot live.
+
+    Chunks carry ``file_sha``/``chunk_sha`` in their metadata. Replaced chunks
+    are tombstoned (``deleted: True``), filtered out of search results and
+    dropped by compact() once they exceed COMPACT_RATIO of the index.
+    """
+    index = faiss.IndexFlatIP(DIM)
+    meta: List[Dict[str, Any]] = []
+
+    _lock = threading.RLock()
+    _snapshot_lock = threading.Lock()  # one snapshot writer at a time; searches don't wait on it
+    _generation = 0
+    _epoch = 0  # bumped whenever index/meta are replaced wholesale (compact, rebuild, load)
+    _loaded_from: str | None = None
+    _mmapped = False
+    _dirty = False
+    _trained_on = 0
+    _deleted = 0
+    # filename -> chunk_sha -> live ids
+    _files: Dict[str, Dict[str, List[int]]] = {}
+
+    @classmethod
+    def add(cls, vecs: np.ndarray, metas: List[Dict[str, Any]]) -> None:
+        if len(vecs) == 0:
+            return
+        with cls._lock:
+            cls._ensure_writable()
+            base = len(cls.meta)
+            cls.index.add(np.ascontiguousarray(vecs, dtype=np.float32))
+            cls.meta.extend(metas)
+            for i, m in enumerate(metas):
+                cls._track(base + i, m)
+            cls._dirty = True
+
+    # Content-hash bookkeeping
+    @classmethod
+    def _track(cls, idx: int, m: Dict[str, Any]) -> None:
+        if m.get("chunk_sha") and not m.get("deleted"):
+            cls._files.setdefault(m["filename"], {}).setdefault(m["chunk_sha"], []).append(idx)
+
+    @classmethod
+    def _reindex_meta(cls) -> None:
+        cls._files = {}
+        cls._deleted = 0
+        for i, m in enumerate(cls.meta):
+            if m.get("deleted"):
+                cls._deleted += 1
+            else:
+                cls._track(i, m)
+
+    @classmethod
+    def file_sha(cls, filename: str) -> str | None:
+        """Content hash of the indexed version of ``filename`` (None if not indexed)."""
+        with cls._lock:
+            chunks = cls._files.get(filename)
+            if not chunks:
+                return None
+            ids = next(iter(chunks.values()))
+            return cls.meta[ids[0]].get("file_sha")
+
+    @classmethod
+    def chunk_shas(cls, filename: str) -> set:
+        with cls._lock:
+            return set(cls._files.get(filename, {}))
+
+    @classmethod
+    def live_chunks(cls, filename: str) -> int:
+        with cls._lock:
+            return sum(len(ids) for ids in cls._files.get(filename, {}).values())
+
+    @classmethod
+    def reconcile_file(cls, filename: str, file_sha: str, keep: set) -> int:
+        """
+        Tombstone chunks of ``filename`` whose hash is not in ``keep`` and stamp
+        the surviving ones with the new file hash. Returns the number retired.
+        """
+        with cls._lock:
+            chunks = cls._files.get(filename, {})
+            retired = 0
+            for sha in list(chunks):
+                if sha in keep:
+                    for idx in chunks[sha]:
+                        cls.meta[idx]["file_sha"] = file_sha
+                    continue
+                for idx in chunks.pop(sha):
+                    cls.meta[idx]["deleted"] = True
+                    retired += 1
+            cls._deleted += retired
+            if not chunks:
+                cls._files.pop(filename, None)
+            cls._dirty = True
+            return retired
+
+    @classmethod
+    def search(cls, qvecs: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """Search a (n, DIM) matrix of query vectors; returns hits per query row."""
+        out: List[List[Dict[str, Any]]] = [[] for _ in range(len(qvecs))]
+        with cls._lock:
+            ntotal = int(cls.index.ntotal)
+            live = ntotal - cls._deleted
+            if ntotal == 0 or live <= 0:
+                return out
+            apply_search_params(cls.index)
+            qvecs = np.ascontiguousarray(qvecs, dtype=np.float32)
+            # Over-fetch 2x top_k scaled by the tombstone share (< 1/(1 - COMPACT_RATIO)
+            # between compactions), not by the tombstone count, so k stays a small
+            # multiple of top_k; rows still short of top_k retry with a larger k
+            fetch = min(ntotal, top_k if not cls._deleted else -(-2 * top_k * ntotal // live))
+            rows = list(range(len(qvecs)))
+            while rows:
+                D, I = cls.index.search(qvecs[rows], fetch)
+                short = []
+                for r, drow, irow in zip(rows, D, I):
+                    out[r] = cls._live_hits(drow, irow, top_k)
+                    # -1 means the index ran out of candidates; a larger k won't help
+                    if len(out[r]) < top_k and fetch < ntotal and irow[-1] != -1:
+                        short.append(r)
+                rows = short
+                fetch = min(ntotal, fetch * 4)
+        return out
+
+    @classmethod
+    def _live_hits(cls, drow: np.ndarray, irow: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        meta = cls.meta
+        hits: List[Dict[str, Any]] = []
+        for idx, score in zip(irow, drow):
+            if idx == -1 or idx >= len(meta) or meta[idx].get("deleted"):
+                continue
+            hits.append({"score": float(score), "meta": meta[idx]})
+            if len(hits) == top_k:
+                break
+        return hits
+
+    # ANN management
+    @classmethod
+    def desired_kind(cls, ntotal: int) -> str:
+        kind = INDEX_MODE if INDEX_MODE in ("flat", "ivf", "hnsw") else (ANN_KIND if ntotal >= ANN_THRESHOLD else "flat")
+        if kind == "ivf" and ntotal < IVF_MIN_TRAIN:
+            return "flat"
+        return kind
+
+    @classmethod
+    def maybe_rebuild(cls) -> bool:
+        """
+        Called by the ingestion path after appends. Switches flat -> ANN once the
+        corpus crosses the threshold and retrains IVF as the corpus grows.
+        """
+        cls.compact()
+        with cls._lock:
+            ntotal = int(cls.index.ntotal)
+            current = index_kind(cls.index)
+            target = cls.desired_kind(ntotal)
+            stale_ivf = current == "ivf" and ntotal > IVF_RETRAIN_FACTOR * max(cls._trained_on, 1)
+            if target == current and not stale_ivf:
+                return False
+            epoch = cls._epoch
+            vecs = cls._reconstruct(cls.index, 0, ntotal)
+
+        t0 = time.perf_counter()
+        new_index = build_index(target, vecs)
+
+        with cls._lock:
+            if cls._epoch != epoch:
+                # A compaction swapped the index meanwhile; ours holds stale ids
+                # (and tombstoned vectors), so drop it
+                logger.info(f"[vector_store] discarded {current}->{target} rebuild: index replaced meanwhile")
+                return False
+            # Carry over anything appended while we were building
+            grown = int(cls.index.ntotal)
+            if grown > ntotal:
+                new_index.add(cls._reconstruct(cls.index, ntotal, grown))
+            cls.index = new_index
+            cls._epoch += 1
+            cls._mmapped = False
+            cls._loaded_from = None
+            cls._trained_on = ntotal
+            cls._dirty = True
+        logger.info(f"[vector_store] rebuilt {current}->{target} ntotal={grown} ms={int((time.perf_counter() - t0) * 1000)}")
+        return True
+
+    @classmethod
+    def compact(cls, force: bool = False) -> int:
+        """
+        Rebuild without tombstoned vectors once they exceed COMPACT_RATIO.
+        Returns the number dropped. The rebuild runs outside the lock, so
+        searches keep being served from the old index meanwhile.
+        """
+        with cls._lock:
+            ntotal = int(cls.index.ntotal)
+            if not cls._deleted or (not force and cls._deleted < COMPACT_RATIO * ntotal):
+                return 0
+            epoch = cls._epoch
+            live = [i for i, m in enumerate(cls.meta) if not m.get("deleted")]
+            vecs = cls._reconstruct(cls.index, 0, ntotal)[live]
+
+        new_index = build_index(cls.desired_kind(len(live)), vecs)
+
+        with cls._lock:
+            if cls._epoch != epoch:
+                return 0
+            # Carry over anything appended while we were building. Chunks
+            # tombstoned meanwhile keep their flag (same meta dicts) and are
+            # dropped by the next compaction.
+            grown = int(cls.index.ntotal)
+            if grown > ntotal:
+                new_index.add(cls._reconstruct(cls.index, ntotal, grown))
+            before = cls._deleted
+            cls.index = new_index
+            cls.meta = [cls.meta[i] for i in live] + cls.meta[ntotal:grown]
+            cls._epoch += 1
+            cls._reindex_meta()
+            dropped = before - cls._deleted
+            cls._mmapped = False
+            cls._loaded_from = None
+            cls._trained_on = len(live)
+            cls._dirty = True
+        logger.info(f"[vector_store] compacted dropped={dropped} live={len(cls.meta) - cls._deleted}")
+        return dropped
+
+    @staticmethod
+    def _reconstruct(index, start: int, end: int) -> np.ndarray:
+        if end <= start:
+            return np.zeros((0, DIM), dtype=np.float32)
+        if index_kind(index) == "ivf":
+            faiss.extract_index_ivf(index).make_direct_map()
+        return index.reconstruct_n(start, end - start)
+
+    @classmethod
+    def _ensure_writable(cls) -> None:
+        # A memory-mapped index is read-only; copy it into RAM on first write
+        if cls._mmapped:
+            cls.index = faiss.clone_index(cls.index)
+            cls._mmapped = False
+            cls._loaded_from = None
+
+    # Persistence
+    @classmethod
+    def snapshot(cls, force: bool = False) -> str | None:
+        """
+        Write the current index and metadata as a new snapshot and make it live.
+        Only the in-memory copy of the index happens under the lock; encoding
+        and disk writes run outside it so searches are not held up.
+        """
+        with cls._snapshot_lock:
+            with cls._lock:
+                if not cls._dirty and not force:
+                    return None
+                t0 = time.perf_counter()
+                ntotal = int(cls.index.ntotal)
+                blob = faiss.serialize_index(cls.index)
+                meta = cls.meta[:ntotal]
+                manifest = {
+                    "format_version": FORMAT_VERSION,
+                    "dim": DIM,
+                    "ntotal": ntotal,
+                    "index_type": index_kind(cls.index),
+                    "trained_on": cls._trained_on,
+                    "deleted": cls._deleted,
+                    "created_at": int(time.time()),
+                }
+                cls._dirty = False
+            try:
+                return cls._write_snapshot(blob, meta, manifest, t0)
+            except Exception:
+                with cls._lock:
+                    cls._dirty = True
+                raise
+
+    @classmethod
+    def _write_snapshot(cls, blob: np.ndarray, meta: List[Dict[str, Any]], manifest: Dict[str, Any], t0: float) -> str:
+        with cls._lock:
+            STORE_DIR.mkdir(parents=True, exist_ok=True)
+            cls._generation = max(cls._generation, cls._latest_generation()) + 1
+            name = f"snap-{cls._generation:06d}"
+        tmp = STORE_DIR / f"{name}.tmp"
+        final = STORE_DIR / name
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        blob.tofile(str(tmp / "index.faiss"))
+        (tmp / "meta.json").write_bytes(orjson.dumps(meta))
+        (tmp / "manifest.json").write_bytes(orjson.dumps(manifest))
+        for fname in ("index.faiss", "meta.json", "manifest.json"):
+            _fsync_file(tmp / fname)
+        os.rename(tmp, final)
+        _fsync_dir(STORE_DIR)
+
+        cur_tmp = STORE_DIR / "CURRENT.tmp"
+        cur_tmp.write_bytes(orjson.dumps({"format_version": FORMAT_VERSION, "snapshot": name}))
+        _fsync_file(cur_tmp)
+        os.replace(cur_tmp, STORE_DIR / "CURRENT")
+        _fsync_dir(STORE_DIR)
+
+        with cls._lock:
+            cls._prune(keep=name)
+        logger.info(f"[vector_store] snapshot={name} ntotal={manifest['ntotal']} ms={int((time.perf_counter() - t0) * 1000)}")
+        return name
+
+    @classmethod
+    def load(cls) -> bool:
+        """Load the live snapshot (memory-mapped) if one exists. Returns True on success."""
+        current = STORE_DIR / "CURRENT"
+        if not current.exists():
+            return False
+        try:
+            pointer = orjson.loads(current.read_bytes())
+            if int(pointer.get("format_version", 0)) > FORMAT_VERSION:
+                raise ValueError(f"unsupported format_version {pointer.get('format_version')}")
+            snap = STORE_DIR / pointer["snapshot"]
+            manifest = orjson.loads((snap / "manifest.json").read_bytes())
+            if manifest.get("dim") != DIM:
+                raise ValueError(f"dim mismatch {manifest.get('dim')} != {DIM}")
+
+            t0 = time.perf_counter()
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            index = faiss.read_index(str(snap / "index.faiss"), flags)
+            meta = orjson.loads((snap / "meta.json").read_bytes())
+            if index.ntotal != manifest["ntotal"] or len(meta) != index.ntotal:
+                raise ValueError("snapshot is inconsistent with its manifest")
+
+            with cls._lock:
+                cls.index = index
+                cls.meta = meta
+                cls._epoch += 1
+                cls._mmapped = True
+                cls._dirty = False
+                cls._loaded_from = snap.name
+                cls._trained_on = int(manifest.get("trained_on", 0))
+                cls._reindex_meta()
+                cls._generation = max(cls._generation, int(snap.name.split("-")[1]))
+            logger.info(f"[vector_store] loaded {snap.name} type={index_kind(index)} ntotal={index.ntotal} ms={int((time.perf_counter() - t0) * 1000)}")
+            return True
+        except Exception as e:
+            logger.error(f"[vector_store] failed to load snapshot: {e}")
+            return False
+
+    @classmethod
+    def _latest_generation(cls) -> int:
+        gens = [int(p.name.split("-")[1]) for p in STORE_DIR.glob("snap-*") if p.is_dir() and not p.name.endswith(".tmp")]
+        return max(gens, default=0)
+
+    @classmethod
+    def _prune(cls, keep: str) -> None:
+        snaps = sorted(p for p in STORE_DIR.glob("snap-*") if p.is_dir())
+        for p in snaps:
+            if p.name.endswith(".tmp"):
+                shutil.rmtree(p, ignore_errors=True)
+        finished = [p for p in snaps if not p.name.endswith(".tmp")]
+        for p in finished[:-KEEP_SNAPSHOTS]:
+            # Never unlink the snapshot the live (mmapped) index was read from
+            if p.name in (keep, cls._loaded_from):
+                continue
+            shutil.rmtree(p, ignore_errors=True)
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+query_engine = pytest.importorskip("services.query_engine")
+QueryEngine = query_engine.QueryEngine
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """QueryEngine without a database, with a one-thread branch pool"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(QueryEngine, "_branch_pool", pool)
+    yield QueryEngine.__new__(QueryEngine)
+    pool.shutdown(wait=True)
+
+
+def test_branch_within_budget_returns_its_value(engine):
+    """Test a fast branch is merged with its own run time"""
+    value, ms, timed_out = QueryEngine._wait_branch(*engine._submit_branch((lambda x: x * 2, 21)), 1000)
+    assert (value, timed_out) == (42, False)
+    assert ms < 1000
+
+
+def test_slow_branch_times_out(engine):
+    """Test a running branch over its budget is reported as timed out"""
+    value, ms, timed_out = QueryEngine._wait_branch(*engine._submit_branch((time.sleep, 0.3)), 50)
+    assert value is None and timed_out
+    assert 50 <= ms < 300
+
+
+def test_queue_time_is_not_charged_to_the_budget(engine):
+    """Test the budget starts when the branch starts, not when it is submitted"""
+    engine._branch_pool.submit(time.sleep, 0.2)  # occupies the only thread
+    run = engine._submit_branch((lambda: time.sleep(0.2) or "done",))
+    value, _, timed_out = QueryEngine._wait_branch(*run, 300)
+    assert (value, timed_out) == ("done", False)
+
+
+def test_branch_still_queued_after_its_budget_is_cancelled(engine):
+    """Test a branch that never got a thread is cancelled instead of running later"""
+    engine._branch_pool.submit(time.sleep, 0.3)
+    calls = []
+    fut, ready, started = run = engine._submit_branch((calls.append, 1))
+    value, _, timed_out = QueryEngine._wait_branch(*run, 50)
+    assert value is None and timed_out
+    assert fut.cancelled() and not ready.is_set()
+    time.sleep(0.35)
+    assert calls == []
@@ -0,0 +1,43 @@
+import pytest
+from services.chunker import Chunker
+
+
+def words(lines):
+    """Token counter stub: one token per whitespace-separated word"""
+    return [len(ln.split()) for ln in lines]
+
+
+def test_splits_on_token_budget_with_overlap():
+    """Test size splits respect the budget and carry overlap lines forward"""
+    text = "\n".join(f"w{i} a b c" for i in range(10))  # 4 tokens per line
+    chunks = Chunker(max_tokens=12, overlap_tokens=4, count_tokens=words).chunk(text)
+    assert all(sum(words(c.splitlines())) <= 12 for c in chunks)
+    assert chunks[0].splitlines()[-1] == chunks[1].splitlines()[0]
+    assert chunks[-1].splitlines()[-1] == "w9 a b c"
+
+
+def test_section_headers_start_new_chunk_without_overlap():
+    """Test header lines split chunks and do not pull in the previous section"""
+    text = "Arjun Sharma\nMumbai\nSkills\nPython, SQL\nExperience\nData Platform"
+    chunks = Chunker(max_tokens=100, overlap_tokens=10, count_tokens=words).chunk(text)
+    assert chunks == ["Arjun Sharma\nMumbai", "Skills\nPython, SQL", "Experience\nData Platform"]
+
+
+def test_oversized_line_is_split():
+    """Test a single line over budget is broken into word windows"""
+    text = " ".join(f"t{i}" for i in range(50))
+    chunks = Chunker(max_tokens=10, overlap_tokens=0, count_tokens=words).chunk(text)
+    assert len(chunks) == 5
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_block_helpers_match_per_line_reference():
+    """Test block-level token counts and header detection agree with a per-line scan"""
+    import re
+    from services.chunker import approx_token_counts, header_lines, SECTION_HEADERS
+    lines = ["Hello, world! a_b (x) 3.5", "", "plain words only", "Café: naïve résumé",
+             "PROJECTS", "see the Education section", "\x1c\x00 tab\tsep"]
+    punct = re.compile(r"[^\w\s]")
+    for block in (lines, lines[:3] + lines[4:6]):
+        assert approx_token_counts(block) == [len(ln.split()) + len(punct.findall(ln)) for ln in block]
+        assert header_lines(block) == [i for i, ln in enumerate(block) if any(h in ln.lower() for h in SECTION_HEADERS)]
@@ -0,0 +1,84 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from services.query_parser import QueryParser
+from services.sql_builder import SQLBuilder
+from services.keyset import encode_cursor, decode_cursor, keyset_shape, keyset_params
+
+
+mock_schema = {
+    "tables": [
+        {
+            "name": "employees",
+            "semantic_tag": "primary_entity",
+            "primary_key": ["emp_id"],
+            "columns": [
+                {"name": "emp_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "full_name", "type": "VARCHAR", "semantic_tag": "name"},
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "annual_salary", "type": "NUMERIC", "semantic_tag": "numeric_measure"},
+                {"name": "join_date", "type": "DATE", "semantic_tag": "date"},
+            ]
+        },
+        {
+            "name": "departments",
+            "semantic_tag": "organizational_unit",
+            "primary_key": ["dept_id"],
+            "columns": [
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "dept_name", "type": "VARCHAR", "semantic_tag": "name"},
+            ]
+        },
+    ],
+    "relationships": [
+        {
+            "from_table": "employees",
+            "from_columns": ["dept_id"],
+            "to_table": "departments",
+            "to_columns": ["dept_id"]
+        }
+    ]
+}
+
+
+def build(query, shape):
+    intent = QueryParser().parse_intent(query, mock_schema)
+    intent["keyset"] = shape
+    sql, params = SQLBuilder().build_sql(intent, mock_schema)
+    return sql, params, intent
+
+
+def test_list_orders_by_column_then_primary_key():
+    """Test keyset list SQL seeks past the cursor row instead of using OFFSET"""
+    sql, _, intent = build("List highest paid employees over 50k", "after")
+    assert intent["keyset_columns"] == ["annual_salary", "emp_id"]
+    assert '(e."annual_salary", e."emp_id") < (:after_order, :after_pk)' in sql
+    assert sql.rstrip().endswith('ORDER BY e."annual_salary" DESC NULLS LAST, e."emp_id" DESC')
+    assert "OFFSET" not in sql
+
+
+def test_top_n_and_aggregates_are_not_keyset_paged():
+    """Test only unbounded list queries switch to keyset paging"""
+    assert "keyset_columns" not in build("Show top 5 highest paid employees", "first")[2]
+    assert "keyset_columns" not in build("Average salary by department", "first")[2]
+
+
+def test_cursor_round_trip_keeps_types():
+    """Test cursors restore Decimal/date values and are tied to their query"""
+    row = {"annual_salary": Decimal("85000.50"), "emp_id": 42, "join_date": date(2024, 1, 2)}
+    cur = encode_cursor("s1", ["annual_salary", "emp_id"], row)
+    after = decode_cursor(cur, "s1")
+    assert keyset_params(after) == {"after_pk": 42, "after_order": Decimal("85000.50")}
+    assert keyset_shape(after) == "after"
+    assert keyset_shape(decode_cursor(encode_cursor("s1", ["join_date", "emp_id"], {"join_date": None, "emp_id": 7}), "s1")) == "after_null"
+    with pytest.raises(ValueError):
+        decode_cursor(cur, "other-query")
+
+
+def test_offset_pages_share_the_keyset_order():
+    """Test OFFSET plans use the same ORDER BY as the first keyset page"""
+    for query in ("List highest paid employees", "List employees"):
+        first, _, _ = build(query, "first")
+        offset, _, intent = build(query, "offset")
+        assert first == offset
+        assert "ORDER BY" in offset and not intent.get("keyset_columns")
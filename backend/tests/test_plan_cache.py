@@ -0,0 +1,106 @@
+import pytest
+from services.query_parser import QueryParser
+from services.sql_builder import SQLBuilder
+from services.plan_cache import PlanCache, INTENT_LIMIT
+
+
+mock_schema = {
+    "tables": [
+        {
+            "name": "employees",
+            "semantic_tag": "primary_entity",
+            "columns": [
+                {"name": "emp_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "full_name", "type": "VARCHAR", "semantic_tag": "name"},
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "annual_salary", "type": "NUMERIC", "semantic_tag": "numeric_measure"},
+                {"name": "join_date", "type": "DATE", "semantic_tag": "date"},
+            ]
+        },
+        {
+            "name": "departments",
+            "semantic_tag": "organizational_unit",
+            "columns": [
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "dept_name", "type": "VARCHAR", "semantic_tag": "name"},
+            ]
+        },
+    ],
+    "relationships": [
+        {
+            "from_table": "employees",
+            "from_columns": ["dept_id"],
+            "to_table": "departments",
+            "to_columns": ["dept_id"]
+        }
+    ]
+}
+
+parser = QueryParser()
+builder = SQLBuilder()
+
+
+def plan(query, version=1):
+    return PlanCache.plan(query, mock_schema, version, parser, builder)
+
+
+def fresh(query):
+    """Plan built without the cache, for comparison"""
+    intent = parser.parse_intent(query, mock_schema)
+    sql, params = builder.build_sql(intent, mock_schema)
+    return sql, params, intent["limit"]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    PlanCache.clear()
+
+
+def test_numbers_share_a_plan():
+    """Test queries differing only in a number reuse the plan with rebound params"""
+    plan("Show top 5 highest paid employees")
+    sql, params, meta, hit = plan("Show top 12 highest paid employees")
+    assert hit
+    assert (sql, params, meta["limit"]) == fresh("Show top 12 highest paid employees")
+    assert params["limit"] == 12
+
+
+def test_reports_to_name_is_rebound():
+    """Test reports-to queries for different people share one plan"""
+    plan("Who reports to Arjun?")
+    sql, params, _, hit = plan("Who reports to Priya Sharma?")
+    assert hit
+    assert params == {"manager_name": "%Priya Sharma%"}
+
+
+def test_k_suffix_and_window_limits():
+    """Test scaled filter values and window limits rebind correctly"""
+    for a, b in [("Employees earning over 50k", "Employees earning over 75k"),
+                 ("Top 3 highest paid in each department", "Top 8 highest paid in each department")]:
+        plan(a)
+        sql, params, meta, hit = plan(b)
+        assert hit
+        assert (sql, params, meta["limit"]) == fresh(b)
+
+
+def test_schema_version_change_invalidates():
+    """Test a new schema version drops cached plans"""
+    plan("Show top 5 highest paid employees", version=1)
+    assert plan("Show top 6 highest paid employees", version=2)[3] is False
+    assert INTENT_LIMIT not in plan("Show top 7 highest paid employees", version=2)[1]
+
+
+def test_probe_failure_marks_template_uncacheable(monkeypatch):
+    """Test a query still plans when re-planning with probe literals raises"""
+    real = parser.parse_intent
+
+    def fragile(query, schema):
+        if "7919" in query:
+            raise ValueError("probe literal rejected")
+        return real(query, schema)
+
+    monkeypatch.setattr(parser, "parse_intent", fragile)
+    sql, params, meta, hit = plan("Show top 5 highest paid employees")
+    assert not hit and params["limit"] == 5
+    assert PlanCache.plan("Show top 6 highest paid employees", mock_schema, 1, parser, builder)[3] is False
+    assert PlanCache.counters["uncacheable"] >= 1
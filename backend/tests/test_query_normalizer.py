@@ -0,0 +1,33 @@
+import pytest
+from services.query_normalizer import normalize, normalize_search, canonical
+
+
+def test_case_whitespace_and_punctuation_fold():
+    """Test trivially different phrasings produce the same cache text"""
+    variants = ["Average salary by department", "average salary by department ", "  Average   salary by department?!"]
+    assert len({normalize(v, enabled=True)[1] for v in variants}) == 1
+
+
+def test_synonyms_collapse_to_canonical_word():
+    """Test synonyms from the keyword tables map to one canonical form"""
+    assert normalize("avg pay per dept", enabled=True)[1] == "average salary per department"
+    assert canonical("Show staff in all divisions") == "Show employees in all departments"
+
+
+def test_reports_to_keeps_name_case():
+    """Test the person name survives normalization for reports-to queries"""
+    text, key = normalize("Who reports to O'Brien?", enabled=True)
+    assert text == key == "Who reports to O'Brien"
+
+
+def test_disabled_passes_through():
+    """Test normalization can be switched off"""
+    assert normalize("Avg Pay?", enabled=False) == ("Avg Pay?", "Avg Pay?")
+
+
+def test_search_queries_keep_punctuation():
+    """Test document search text and keys keep the punctuation that names skills"""
+    keys = {normalize_search(q, enabled=True)[1] for q in ("C++ developer resume", "C# developer resume", "C developer resume")}
+    assert len(keys) == 3
+    assert normalize_search("  Node.js   and .NET resumes ", enabled=True) == ("Node.js and .NET resumes", "node.js and .net resumes")
+    assert normalize_search("C++ Resume", enabled=True)[1] == normalize_search("c++  resume", enabled=True)[1]
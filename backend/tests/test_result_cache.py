@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+pytest.importorskip("redis")
+
+from services.result_cache import LocalLRU
+
+
+def test_evicts_least_recently_used_by_item_count():
+    """Test the oldest untouched entry goes first once max_items is exceeded"""
+    lru = LocalLRU(max_items=2, max_bytes=1024, ttl=60)
+    lru.set("a", b"1")
+    lru.set("b", b"2")
+    assert lru.get("a") == b"1"  # a is now more recent than b
+    lru.set("c", b"3")
+    assert lru.get("b") is None
+    assert lru.get("a") == b"1" and lru.get("c") == b"3"
+    assert lru.stats()["items"] == 2
+
+
+def test_evicts_by_total_bytes_and_skips_oversized_blobs():
+    """Test the byte budget evicts old entries and a blob over it is never stored"""
+    lru = LocalLRU(max_items=100, max_bytes=10, ttl=60)
+    lru.set("a", b"x" * 4)
+    lru.set("b", b"x" * 4)
+    lru.set("c", b"x" * 4)
+    assert lru.get("a") is None
+    assert lru.stats()["bytes"] == 8
+    lru.set("big", b"x" * 11)
+    assert lru.get("big") is None
+    lru.set("b", b"y")  # replacing an entry releases its old bytes
+    assert lru.stats()["bytes"] == 5
+
+
+def test_purge_drops_only_the_bumped_namespace():
+    """Test purge removes entries tagged with the namespace and keeps the byte count right"""
+    lru = LocalLRU(max_items=10, max_bytes=1024, ttl=60)
+    lru.set("sql", b"aa", ("sql",))
+    lru.set("docs", b"bbb", ("documents",))
+    lru.set("hybrid", b"c", ("sql", "documents"))
+    assert lru.purge("documents") == 2
+    assert lru.get("sql") == b"aa"
+    assert lru.get("docs") is None and lru.get("hybrid") is None
+    assert lru.stats()["bytes"] == 2
+
+
+def test_expired_entries_are_misses():
+    """Test entries past their TTL are dropped on read"""
+    lru = LocalLRU(max_items=10, max_bytes=1024, ttl=0)
+    lru.set("a", b"1")
+    time.sleep(0.01)
+    assert lru.get("a") is None
+    assert lru.stats() == {"items": 0, "bytes": 0, "max_items": 10, "max_bytes": 1024}
@@ -0,0 +1,66 @@
+from services.schema_index import SchemaIndex
+
+
+mock_schema = {
+    "tables": [
+        {
+            "name": "audit_log",
+            "semantic_tag": "auxiliary",
+            "columns": [{"name": "log_id", "type": "INTEGER", "semantic_tag": "identifier"}]
+        },
+        {
+            "name": "employees",
+            "semantic_tag": "primary_entity",
+            "columns": [
+                {"name": "emp_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "full_name", "type": "VARCHAR", "semantic_tag": "name"},
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "annual_salary", "type": "NUMERIC", "semantic_tag": "numeric_measure"},
+                {"name": "bonus_amount", "type": "NUMERIC", "semantic_tag": "numeric_measure"},
+            ]
+        },
+        {
+            "name": "departments",
+            "semantic_tag": "organizational_unit",
+            "columns": [
+                {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+                {"name": "dept_name", "type": "VARCHAR", "semantic_tag": "name"},
+            ]
+        },
+        {
+            "name": "teams",
+            "semantic_tag": "organizational_unit",
+            "columns": [{"name": "team_name", "type": "VARCHAR", "semantic_tag": "name"}]
+        },
+    ],
+    "relationships": [
+        {"from_table": "employees", "from_columns": ["dept_id"], "to_table": "departments", "to_columns": ["dept_id"]},
+        {"from_table": "employees", "from_columns": ["emp_id"], "to_table": "departments", "to_columns": ["manager_id"]},
+    ]
+}
+
+
+def test_first_match_wins():
+    """Test lookups resolve to the first match in schema order, like the scans they replace"""
+    idx = SchemaIndex(mock_schema)
+    assert idx.first_table == "audit_log"
+    assert idx.table_by_tag("organizational_unit") == "departments"
+    assert idx.column("employees", "numeric_measure") == "annual_salary"
+    assert idx.name_column("employees") == "full_name"
+    assert idx.fk("employees", "departments") == ("dept_id", "dept_id")
+
+
+def test_missing_entries():
+    """Test absent tables, tags and relationships resolve to None"""
+    idx = SchemaIndex(mock_schema)
+    assert idx.table("payroll") is None
+    assert idx.table_by_tag("document_store") is None
+    assert idx.column("departments", "date") is None
+    assert idx.fk("departments", "employees") == (None, None)
+
+
+def test_index_is_cached_per_schema():
+    """Test the same schema dict reuses its index and a new dict gets its own"""
+    assert SchemaIndex.of(mock_schema) is SchemaIndex.of(mock_schema)
+    other = {**mock_schema, "tables": mock_schema["tables"][1:]}
+    assert SchemaIndex.of(other).first_table == "employees"
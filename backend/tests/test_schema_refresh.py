@@ -0,0 +1,46 @@
+import copy
+
+import pytest
+
+schema_discovery = pytest.importorskip("services.schema_discovery")
+SchemaDiscovery = schema_discovery.SchemaDiscovery
+
+
+def table(name, *cols):
+    return {"name": name, "columns": [{"name": c, "type": "INTEGER", "semantic_tag": "identifier"} for c in cols]}
+
+
+old_schema = {
+    "tables": [table("departments", "dept_id"), table("employees", "emp_id", "dept_id"), table("legacy", "id")],
+    "relationships": [
+        {"from_table": "employees", "from_columns": ["dept_id"], "to_table": "departments", "to_columns": ["dept_id"]},
+        {"from_table": "legacy", "from_columns": ["id"], "to_table": "departments", "to_columns": ["dept_id"]},
+    ],
+    "samples": {"departments": [{"dept_id": 1}], "employees": [{"emp_id": 1}], "legacy": [{"id": 1}]},
+    "samples_skipped": [{"table": "legacy", "reason": "timeout"}],
+    "fingerprints": {"departments": "d1", "employees": "e1", "legacy": "l1"},
+    "alias_vocab": ["departments", "employees", "legacy"],
+}
+
+
+def test_refresh_replaces_changed_and_drops_removed_tables():
+    """Test only changed/dropped tables' entries are replaced and the input is left alone"""
+    before = copy.deepcopy(old_schema)
+    fresh = {
+        "tables": [table("employees", "emp_id", "dept_id", "manager_id")],
+        "relationships": [
+            {"from_table": "employees", "from_columns": ["manager_id"], "to_table": "employees", "to_columns": ["emp_id"]},
+        ],
+    }
+    out = SchemaDiscovery()._merge_refresh(
+        old_schema, fresh, {"employees": [{"emp_id": 2}]}, [{"table": "employees", "reason": "error"}],
+        {"employees", "legacy"}, {"departments": "d1", "employees": "e2"},
+    )
+    assert [t["name"] for t in out["tables"]] == ["departments", "employees"]
+    assert [c["name"] for c in out["tables"][1]["columns"]] == ["emp_id", "dept_id", "manager_id"]
+    assert [(r["from_table"], r["from_columns"]) for r in out["relationships"]] == [("employees", ["manager_id"])]
+    assert out["samples"] == {"departments": [{"dept_id": 1}], "employees": [{"emp_id": 2}]}
+    assert out["samples_skipped"] == [{"table": "employees", "reason": "error"}]
+    assert out["fingerprints"] == {"departments": "d1", "employees": "e2"}
+    assert "manager_id" in out["alias_vocab"] and "legacy" not in out["alias_vocab"]
+    assert old_schema == before
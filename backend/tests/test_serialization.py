@@ -0,0 +1,39 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+import orjson
+import pytest
+
+from services.serialization import dumps
+
+
+def test_database_types_encode_like_jsonable_encoder():
+    """Test row values beyond orjson's native types render as FastAPI's encoder did"""
+    row = {
+        "salary": Decimal("85000"),
+        "rating": Decimal("4.25"),
+        "tenure": timedelta(days=1, seconds=30),
+        "photo": memoryview(b"\x89PNG\x00\xff"),
+        "note": b"plain text",
+        "joined": date(2024, 1, 2),
+        "at": datetime(2024, 1, 2, 3, 4, 5),
+        "shift_start": time(9, 30),
+        "tags": {"python"},
+        "uid": UUID(int=1),
+    }
+    out = orjson.loads(dumps(row))
+    assert out["salary"] == 85000 and isinstance(out["salary"], int)
+    assert out["rating"] == 4.25
+    assert out["tenure"] == 86430.0
+    assert out["photo"] == "iVBORwD/"
+    assert out["note"] == "plain text"
+    assert out["joined"] == "2024-01-02" and out["shift_start"] == "09:30:00"
+    assert out["tags"] == ["python"]
+    assert out["uid"] == "00000000-0000-0000-0000-000000000001"
+
+
+def test_unknown_types_still_fail():
+    """Test unsupported objects raise instead of being silently stringified"""
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
@@ -0,0 +1,73 @@
+# tools/bench_ann.py
+# Recall-vs-latency of the ANN VectorStore modes against the exact flat index.
+# Run from the repo root:  python tools/bench_ann.py --n 300000 --queries 500
+import argparse, json, sys, time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from services.vector_store import DIM, build_index, apply_search_params  # noqa: E402
+
+
+def synthetic(n, dim, seed):
+    # Clustered unit vectors look more like sentence embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, n // 2000), dim)).astype(np.float32)
+    xs = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    xs /= np.linalg.norm(xs, axis=1, keepdims=True)
+    return xs
+
+
+def timed_search(index, qs, k):
+    lat = []
+    found = []
+    for q in qs:
+        t0 = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        found.append(I[0])
+    lat.sort()
+    return np.array(found), lat[len(lat) // 2], lat[int(0.95 * (len(lat) - 1))]
+
+
+def recall(found, truth, k):
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--nprobe", default="4,8,16,32,64")
+    ap.add_argument("--ef", default="16,32,64,128")
+    args = ap.parse_args()
+
+    data = synthetic(args.n + args.queries, DIM, seed=7)
+    base, qs = data[:args.n], data[args.n:]
+
+    rows = []
+    t0 = time.perf_counter()
+    flat = build_index("flat", base)
+    truth, p50, p95 = timed_search(flat, qs, args.k)
+    rows.append({"index": "flat", "param": "-", "build_s": round(time.perf_counter() - t0, 2),
+                 "recall": 1.0, "p50_ms": round(p50, 3), "p95_ms": round(p95, 3)})
+
+    for kind, knob, values in (("ivf", "nprobe", args.nprobe), ("hnsw", "efSearch", args.ef)):
+        t0 = time.perf_counter()
+        index = build_index(kind, base)
+        build_s = round(time.perf_counter() - t0, 2)
+        for v in [int(x) for x in values.split(",")]:
+            if kind == "ivf":
+                apply_search_params(index, nprobe=v)
+            else:
+                apply_search_params(index, ef_search=v)
+            found, p50, p95 = timed_search(index, qs, args.k)
+            rows.append({"index": kind, "param": f"{knob}={v}", "build_s": build_s,
+                         "recall": round(recall(found, truth, args.k), 4), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3)})
+
+    print(json.dumps(rows, indent=2))
+    print(f"\n{'index':<6} {'param':<14} {'recall@' + str(args.k):<10} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in rows:
+        print(f"{r['index']:<6} {r['param']:<14} {r['recall']:<10} {r['p50_ms']:>8} {r['p95_ms']:>8}")
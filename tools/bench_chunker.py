@@ -0,0 +1,75 @@
+# tools/bench_chunker.py
+# Chunking throughput on large synthetic documents: legacy character chunker vs the
+# streaming token-aware Chunker. Run from the repo root:
+#   python tools/bench_chunker.py --mb 4 [--tokenizer model]
+import argparse, json, random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from services.chunker import Chunker, approx_token_counts, SECTION_HEADERS  # noqa: E402
+
+WORDS = ("data platform pipeline python spark engineer retrospective quarterly objectives delivered "
+         "stakeholders migration latency throughput budget compliance onboarding mentoring").split()
+
+
+def synthetic_doc(mb, seed=11):
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < mb * 1024 * 1024:
+        if rng.random() < 0.001:
+            ln = rng.choice(SECTION_HEADERS).title()
+        else:
+            ln = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30)))
+        lines.append(ln)
+        size += len(ln) + 1
+    return "\n".join(lines)
+
+
+def legacy_chunking(content, max_len=1400):
+    # Pre-streaming implementation, kept here as the baseline
+    headers = SECTION_HEADERS
+    lines = [ln.strip() for ln in content.splitlines()]
+    parts, buf = [], []
+    for ln in lines:
+        if any(h in ln.lower() for h in headers) and buf:
+            parts.append("\n".join(buf).strip())
+            buf = [ln]
+        else:
+            if len("\n".join(buf)) + len(ln) + 1 > max_len:
+                parts.append("\n".join(buf).strip())
+                buf = [ln]
+            else:
+                buf.append(ln)
+    if buf:
+        parts.append("\n".join(buf).strip())
+    return [p for p in parts if p]
+
+
+def run(name, fn, doc, mb):
+    t0 = time.perf_counter()
+    chunks = fn(doc)
+    s = time.perf_counter() - t0
+    return {"chunker": name, "chunks": len(chunks), "seconds": round(s, 3), "mb_per_s": round(mb / s, 2)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=4)
+    ap.add_argument("--max-tokens", default="250,1000,4000", help="comma-separated budgets to sweep")
+    ap.add_argument("--overlap", type=int, default=32)
+    ap.add_argument("--tokenizer", choices=["approx", "model"], default="approx")
+    args = ap.parse_args()
+
+    doc = synthetic_doc(args.mb)
+    counter = approx_token_counts
+    if args.tokenizer == "model":
+        from services.embeddings import Embeddings
+        counter = Embeddings.count_tokens
+    rows = []
+    for budget in [int(x) for x in args.max_tokens.split(",")]:
+        # ~5.6 characters per WordPiece token on English prose
+        max_len = int(budget * 5.6)
+        chunker = Chunker(max_tokens=budget, overlap_tokens=args.overlap, count_tokens=counter)
+        rows.append({"budget_tokens": budget, **run(f"legacy/{max_len}ch", lambda d: legacy_chunking(d, max_len), doc, args.mb)})
+        rows.append({"budget_tokens": budget, **run(f"streaming/{args.tokenizer}", chunker.chunk, doc, args.mb)})
+    print(json.dumps(rows, indent=2))
@@ -0,0 +1,43 @@
+# tools/bench_pagination.py
+# Page-N latency: walk a list query page by page with OFFSET and with next_cursor.
+# Start the server with REDIS_TTL=0 so every page hits Postgres.
+import time, argparse, json, urllib.request
+
+def post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        body = json.load(resp)
+    return body, (time.perf_counter() - t0) * 1000.0
+
+def walk(url, query, size, pages, mode):
+    lat, cursor = [], None
+    for n in range(pages):
+        payload = {"query": query, "limit": size}
+        if mode == "offset":
+            # offset > 0 without a cursor keeps the OFFSET plan
+            payload["offset"] = n * size
+        elif cursor:
+            payload["cursor"] = cursor
+        body, ms = post(url, payload)
+        lat.append(ms)
+        cursor = body.get("next_cursor")
+        if mode == "cursor" and not cursor:
+            break
+    return lat
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000/api/query")
+    ap.add_argument("--query", default="List employees")
+    ap.add_argument("--size", type=int, default=200)
+    ap.add_argument("--pages", type=int, default=100)
+    args = ap.parse_args()
+    offset = walk(args.url, args.query, args.size, args.pages, "offset")
+    cursor = walk(args.url, args.query, args.size, args.pages, "cursor")
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+    for n in sorted({0, 1, 9, 49, 99, len(cursor) - 1, len(offset) - 1}):
+        if n < len(offset) or n < len(cursor):
+            o = f"{offset[n]:.1f}" if n < len(offset) else "-"
+            c = f"{cursor[n]:.1f}" if n < len(cursor) else "-"
+            print(f"{n + 1:>6} {o:>10} {c:>10}")
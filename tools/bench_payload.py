@@ -0,0 +1,56 @@
+# tools/bench_payload.py
+# Payload size and serialization time for a /api/query response: FastAPI's default
+# encoder (jsonable_encoder + json.dumps) vs orjson, row-of-dicts vs columnar.
+import os, sys, json, gzip, time, argparse, random
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from api.responses import FastJSONResponse, columnar  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def sample_rows(n):
+    rnd = random.Random(7)
+    return [{
+        "emp_id": i, "full_name": f"Employee {i}", "dept_id": rnd.randint(1, 12),
+        "position": rnd.choice(["Engineer", "Analyst", "Manager", "Designer"]),
+        "annual_salary": Decimal(rnd.randint(40000, 200000)) / 1,
+        "join_date": date(2015, 1, 1) + timedelta(days=rnd.randint(0, 3500)),
+        "office_location": rnd.choice(["Mumbai", "Bangalore", "Chennai", "Delhi"]),
+        "department": rnd.choice(["Engineering", "Sales", "Finance", "HR"]),
+    } for i in range(n)]
+
+def default_encode(out):
+    return json.dumps(jsonable_encoder(out), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def orjson_encode(out):
+    return FastJSONResponse(out).body
+
+def timed(fn, out, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        body = fn(out)
+    return body, (time.perf_counter() - t0) * 1000 / reps
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200)
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+    rows = sample_rows(args.rows)
+    shape = lambda table: {"query_type": "sql", "results": {"table": table}, "performance_metrics": {"cache_hit": False}}
+    cases = [
+        ("default rows", default_encode, shape(rows)),
+        ("orjson rows", orjson_encode, shape(rows)),
+        ("orjson columnar", orjson_encode, shape(columnar(rows))),
+    ]
+    print(f"{'format':<18} {'encode ms':>10} {'bytes':>9} {'gzip':>8} {'br':>8}")
+    for name, fn, out in cases:
+        body, ms = timed(fn, out, args.reps)
+        br = len(brotli.compress(body)) if brotli else "-"
+        print(f"{name:<18} {ms:>10.3f} {len(body):>9} {len(gzip.compress(body)):>8} {br:>8}")
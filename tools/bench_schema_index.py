@@ -0,0 +1,95 @@
+# tools/bench_schema_index.py
+# Schema lookups per query on a wide synthetic schema: the linear next(...) scans
+# QueryParser/SQLBuilder used to do vs the compiled SchemaIndex, plus end-to-end
+# parse_intent + build_sql time.
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from services.query_parser import QueryParser  # noqa: E402
+from services.sql_builder import SQLBuilder  # noqa: E402
+from services.schema_index import SchemaIndex  # noqa: E402
+
+QUERIES = [
+    "Show top 5 highest paid employees",
+    "Average salary by department",
+    "Employees earning over 100k hired last year",
+    "Top 3 highest paid in each department",
+    "Who reports to Arjun?",
+    "List employees",
+]
+
+def synthetic_schema(n_tables, n_cols):
+    # Filler tables first, so scans for the entity/org tables walk the whole list
+    tables = [{
+        "name": f"aux_{i}", "semantic_tag": "auxiliary",
+        "columns": [{"name": f"c{j}", "type": "VARCHAR", "semantic_tag": "text"} for j in range(n_cols)],
+    } for i in range(n_tables - 2)]
+    rels = [{"from_table": f"aux_{i}", "from_columns": ["c0"], "to_table": f"aux_{i + 1}", "to_columns": ["c0"]}
+            for i in range(n_tables - 3)]
+    filler = [{"name": f"x{j}", "type": "VARCHAR", "semantic_tag": "text"} for j in range(n_cols)]
+    tables.append({"name": "employees", "semantic_tag": "primary_entity", "primary_key": ["emp_id"], "columns": filler + [
+        {"name": "emp_id", "type": "INTEGER", "semantic_tag": "identifier"},
+        {"name": "full_name", "type": "VARCHAR", "semantic_tag": "name"},
+        {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+        {"name": "annual_salary", "type": "NUMERIC", "semantic_tag": "numeric_measure"},
+        {"name": "join_date", "type": "DATE", "semantic_tag": "date"},
+        {"name": "office_location", "type": "VARCHAR", "semantic_tag": "location"},
+    ]})
+    tables.append({"name": "departments", "semantic_tag": "organizational_unit", "columns": filler + [
+        {"name": "dept_id", "type": "INTEGER", "semantic_tag": "identifier"},
+        {"name": "dept_name", "type": "VARCHAR", "semantic_tag": "name"},
+    ]})
+    rels.append({"from_table": "employees", "from_columns": ["dept_id"], "to_table": "departments", "to_columns": ["dept_id"]})
+    return {"tables": tables, "relationships": rels}
+
+def scan_lookups(schema):
+    """The lookups one list/aggregate query used to make, as linear scans."""
+    entity = next(t["name"] for t in schema["tables"] if t.get("semantic_tag") == "primary_entity")
+    org = next(t["name"] for t in schema["tables"] if t.get("semantic_tag") == "organizational_unit")
+    fk = next((r["from_columns"][0], r["to_columns"][0]) for r in schema["relationships"]
+              if r["from_table"] == entity and r["to_table"] == org)
+    out = [fk]
+    for name, tag in [(entity, "numeric_measure"), (entity, "numeric_measure"), (entity, "date"),
+                      (entity, "location"), (org, "name")]:
+        tbl = next(t for t in schema["tables"] if t["name"] == name)
+        out.append(next(c["name"] for c in tbl["columns"] if c.get("semantic_tag") == tag))
+    return out
+
+def index_lookups(schema):
+    idx = SchemaIndex.of(schema)
+    entity, org = idx.table_by_tag("primary_entity"), idx.table_by_tag("organizational_unit")
+    out = [idx.fk(entity, org)]
+    for name, tag in [(entity, "numeric_measure"), (entity, "numeric_measure"), (entity, "date"),
+                      (entity, "location"), (org, "name")]:
+        out.append(idx.column(name, tag))
+    return out
+
+def timed(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / reps
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tables", type=int, default=1000)
+    ap.add_argument("--cols", type=int, default=20)
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+    schema = synthetic_schema(args.tables, args.cols)
+    assert scan_lookups(schema) == index_lookups(schema)
+
+    t0 = time.perf_counter()
+    SchemaIndex(schema)
+    build_ms = (time.perf_counter() - t0) * 1000
+    parser, builder = QueryParser(), SQLBuilder()
+
+    def end_to_end():
+        for q in QUERIES:
+            builder.build_sql(parser.parse_intent(q, schema), schema)
+
+    print(f"schema: {args.tables} tables x {args.cols}+ columns; index build {build_ms:.1f} ms (once per schema)")
+    print(f"{'case':<28} {'us/op':>10}")
+    print(f"{'lookups, linear scan':<28} {timed(lambda: scan_lookups(schema), args.reps):>10.1f}")
+    print(f"{'lookups, SchemaIndex':<28} {timed(lambda: index_lookups(schema), args.reps):>10.1f}")
+    print(f"{'parse+build x' + str(len(QUERIES)) + ' (indexed)':<28} {timed(end_to_end, args.reps):>10.1f}")
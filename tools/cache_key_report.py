@@ -0,0 +1,49 @@
+# tools/cache_key_report.py
+# Offline report: how much would query normalization raise the result-cache hit rate
+# for the queries in QueryHistory? Replays the history against an unbounded cache
+# keyed on the raw text vs. the normalized text (TTL and invalidation ignored).
+import os, sys, json, argparse, urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from services.query_normalizer import normalize  # noqa: E402
+
+def load_history(src, n):
+    if src.startswith("http"):
+        with urllib.request.urlopen(f"{src}?n={n}", timeout=10) as resp:
+            data = json.load(resp)
+    else:
+        with open(src) as f:
+            data = json.load(f)
+    items = data.get("history", data) if isinstance(data, dict) else data
+    return [it["query"] if isinstance(it, dict) else it for it in items]
+
+def replay(queries, key):
+    seen, hits = set(), 0
+    for q in queries:
+        k = key(q)
+        hits += k in seen
+        seen.add(k)
+    return {"unique_keys": len(seen), "hits": hits, "hit_rate": round(hits / len(queries), 3) if queries else 0.0}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", default="http://localhost:8000/api/query/history", help="history URL or a saved JSON file")
+    ap.add_argument("-n", type=int, default=10000, help="history entries to fetch")
+    ap.add_argument("--show", type=int, default=10, help="merged key groups to print")
+    args = ap.parse_args()
+
+    queries = load_history(args.source, args.n)
+    raw = replay(queries, lambda q: q)
+    norm = replay(queries, lambda q: normalize(q, enabled=True)[1])
+    print(json.dumps({"queries": len(queries), "raw": raw, "normalized": norm,
+                      "hit_rate_gain": round(norm["hit_rate"] - raw["hit_rate"], 3)}, indent=2))
+
+    groups = defaultdict(set)
+    for q in queries:
+        groups[normalize(q, enabled=True)[1]].add(q)
+    merged = sorted((g for g in groups.items() if len(g[1]) > 1), key=lambda g: -len(g[1]))
+    for key, variants in merged[:args.show]:
+        print(f"\n{key!r} <- {len(variants)} variants")
+        for v in sorted(variants):
+            print(f"    {v!r}")